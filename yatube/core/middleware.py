@@ -0,0 +1,30 @@
+from django.conf import settings
+
+from .routers import primary_pinned, primary_written
+
+
+class PinPrimaryAfterWriteMiddleware:
+    """Закрепляет чтения за основной базой после записи (read-your-writes)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = primary_pinned.set(
+            settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        written = primary_written.set(False)
+        try:
+            response = self.get_response(request)
+            if settings.DATABASE_REPLICAS and primary_written.get():
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE,
+                    '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True,
+                    samesite='Lax'
+                )
+        finally:
+            primary_written.reset(written)
+            primary_pinned.reset(pinned)
+        return response
@@ -0,0 +1,45 @@
+"""Чтение из реплик для представлений, которые ничего не пишут.
+
+После записи в основную базу пользователь на REPLICA_PIN_SECONDS
+получает cookie, и его чтения идут в основную базу, пока реплики
+не догонят её: так он сразу видит свой новый пост или комментарий.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+replica_reads_enabled = ContextVar('replica_reads_enabled', default=False)
+primary_pinned = ContextVar('primary_pinned', default=False)
+primary_written = ContextVar('primary_written', default=False)
+
+
+def replica_reads(view):
+    """Направляет чтения внутри представления в реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = replica_reads_enabled.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            replica_reads_enabled.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (settings.DATABASE_REPLICAS and replica_reads_enabled.get()
+                and not primary_pinned.get()):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        primary_written.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.middleware import PinPrimaryAfterWriteMiddleware
+from core.routers import ReplicaRouter, replica_reads
+from posts.models import Group, Post
+
+REPLICAS = ['replica_1', 'replica_2']
+
+
+class SqliteProfileTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings_dict = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(self.directory, 'wal.sqlite3'),
+        }
+        self.connection = DatabaseWrapper(settings_dict, alias='wal_test')
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def journal_mode(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            return cursor.fetchone()[0]
+
+    def test_sqlite_uses_wal(self):
+        self.assertEqual(self.journal_mode(), 'wal')
+
+    @override_settings(SQLITE_WAL=False)
+    def test_wal_can_be_disabled(self):
+        self.assertEqual(self.journal_mode(), 'delete')
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def read_db(self):
+        return self.router.db_for_read(Post)
+
+    @override_settings(DATABASE_REPLICAS=REPLICAS)
+    def test_reads_go_to_replicas_only_inside_feed_views(self):
+        self.assertEqual(self.read_db(), 'default')
+        view = replica_reads(lambda request: self.read_db())
+        self.assertIn(view(None), REPLICAS)
+        self.assertEqual(self.read_db(), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_without_replicas_reads_go_to_default(self):
+        view = replica_reads(lambda request: self.read_db())
+        self.assertEqual(view(None), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class PinPrimaryAfterWriteTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def call(self, view, cookies=None):
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies or {})
+        return PinPrimaryAfterWriteMiddleware(view)(request)
+
+    def test_write_sets_pin_cookie(self):
+        def write_view(request):
+            Group.objects.create(title='Группа', slug='group')
+            return HttpResponse()
+
+        response = self.call(write_view)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertNotIn(
+            settings.REPLICA_PIN_COOKIE,
+            self.call(lambda request: HttpResponse()).cookies
+        )
+
+    def test_pinned_reader_reads_from_primary(self):
+        @replica_reads
+        def read_view(request):
+            return HttpResponse(self.router.db_for_read(Post))
+
+        response = self.call(read_view, {settings.REPLICA_PIN_COOKIE: '1'})
+        self.assertEqual(response.content, b'default')
+        self.assertIn(self.call(read_view).content.decode(), REPLICAS)
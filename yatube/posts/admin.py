@@ -1,6 +1,26 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 
-from .models import Group, Follow, Post
+from . import export
+from .models import Comment, Group, Follow, Post
+from .search import search_posts
+from .thumbnails import enqueue_thumbnails
+
+
+def export_action(table, export_format):
+    def action(modeladmin, request, queryset):
+        _, fields = export.TABLES[table]
+        response = StreamingHttpResponse(
+            export.stream(queryset, fields, export_format),
+            content_type=export.CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{table}.{export_format}"'
+        )
+        return response
+    action.__name__ = f'export_{export_format}'
+    action.short_description = f'Выгрузить выбранное в {export_format.upper()}'
+    return action
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,8 +35,41 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    actions = (export_action('posts', 'jsonl'), export_action('posts', 'csv'))
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_posts(queryset, search_term, ranked=False), False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            enqueue_thumbnails(obj)
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
-admin.site.register(Follow)
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author')
+    actions = (
+        export_action('follows', 'jsonl'),
+        export_action('follows', 'csv')
+    )
+
+
+admin.site.register(Follow, FollowAdmin)
+
+
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    actions = (
+        export_action('comments', 'jsonl'),
+        export_action('comments', 'csv')
+    )
+
+
+admin.site.register(Comment, CommentAdmin)
@@ -0,0 +1,58 @@
+"""Счётчики ссылок на файлы картинок.
+
+Одинаковые картинки хранятся одним файлом (см. storage), поэтому файл
+и его миниатюры удаляются, только когда на него не ссылается ни один пост.
+Запись с нулём ссылок остаётся до удаления файла: delete_unreferenced
+держит блокировку её строки, пока удаляет файл, и retain той же картинки
+ждёт и создаёт запись заново.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from sorl import thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageBlob, Post
+
+image_field = Post._meta.get_field('image')
+
+
+def is_managed(name):
+    return bool(name) and name.startswith(image_field.upload_to)
+
+
+def retain(name, count=1):
+    if not is_managed(name):
+        return
+    if ImageBlob.objects.filter(name=name).update(
+        references=F('references') + count
+    ):
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, references=count)
+    except IntegrityError:
+        # Запись успел создать параллельный запрос.
+        retain(name, count)
+
+
+def release(name):
+    if not is_managed(name):
+        return
+    ImageBlob.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    if ImageBlob.objects.filter(name=name, references=0).exists():
+        transaction.on_commit(lambda: delete_unreferenced(name))
+
+
+def delete_unreferenced(name):
+    with transaction.atomic():
+        # Пока транзакция завершалась, ту же картинку могли загрузить снова.
+        blob = ImageBlob.objects.select_for_update().filter(
+            name=name,
+            references=0
+        ).first()
+        if blob is None:
+            return
+        thumbnail.delete(ImageFile(name, image_field.storage))
+        blob.delete()
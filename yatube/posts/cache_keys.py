@@ -0,0 +1,43 @@
+"""Ключи всех записей кэша приложения posts.
+
+Префикс и версию добавляет сам бэкенд (KEY_PREFIX и VERSION в
+settings.CACHES), поэтому здесь описана только структура ключа.
+Произвольные части ключа хэшируются: memcached не допускает
+пробелов и ключей длиннее 250 байт.
+"""
+import hashlib
+
+
+def digest(*parts):
+    raw = '\x1f'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def feed_generation(scope):
+    return f'posts:feed-generation:{digest(scope)}'
+
+
+def feed_page(scope, full_path):
+    return f'posts:feed-page:{digest(scope, full_path)}'
+
+
+def feed_page_lock(scope, full_path):
+    return f'{feed_page(scope, full_path)}:lock'
+
+
+def feed_stats(outcome):
+    return f'posts:feed-stats:{outcome}'
+
+
+def post_card(post, show_url):
+    group = post.group
+    return 'posts:card:{}:{}'.format(post.pk, digest(
+        post.updated.timestamp(),
+        post.author.username,
+        post.author.first_name,
+        post.author.last_name,
+        group and group.pk,
+        group and group.title,
+        group and group.slug,
+        bool(show_url),
+    ))
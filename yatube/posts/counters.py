@@ -0,0 +1,59 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики обновляются атомарно через F() в сигналах. Массовые операции
+(bulk_create, queryset.update) сигналов не вызывают, расхождения
+исправляет команда recount.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def bump(model, pk, field, delta):
+    if pk is None:
+        return
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    bump(UserCounters, user_id, field, delta)
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def recount():
+    for user_id in User.objects.filter(counters=None).values_list(
+        'pk',
+        flat=True
+    ).iterator():
+        UserCounters.objects.get_or_create(user_id=user_id)
+    UserCounters.objects.update(
+        posts_count=count_subquery(Post, 'author'),
+        followers_count=count_subquery(Follow, 'author'),
+        following_count=count_subquery(Follow, 'user'),
+    )
+    Group.objects.update(posts_count=count_subquery(Post, 'group'))
+    Post.objects.update(comments_count=count_subquery(Comment, 'post'))
+
+
+def recount_follows(user_ids):
+    """Пересчитывает подписки пользователей после bulk_create."""
+    UserCounters.objects.filter(user_id__in=user_ids).update(
+        followers_count=count_subquery(Follow, 'author'),
+        following_count=count_subquery(Follow, 'user'),
+    )
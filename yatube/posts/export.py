@@ -0,0 +1,97 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Строки читаются по возрастанию id пачками через iterator(chunk_size), на
+PostgreSQL — серверным курсором, поэтому память не зависит от размера
+таблицы. Последний выгруженный id пачки служит точкой продолжения.
+Форматы: jsonl, csv и columnar — по строке JSON на пачку, где каждому
+полю соответствует массив значений. Для скачивания с сайта есть ещё json —
+один массив объектов, который собирается по мере чтения пачек.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+from .models import Comment, Follow, Post
+
+TABLES = {
+    'posts': (
+        Post,
+        ('id', 'author_id', 'group_id', 'text', 'pub_date', 'image'),
+    ),
+    'comments': (
+        Comment,
+        ('id', 'post_id', 'author_id', 'text', 'created'),
+    ),
+    'follows': (Follow, ('id', 'user_id', 'author_id')),
+}
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'columnar': 'application/x-ndjson',
+}
+EXTENSIONS = {'jsonl': 'jsonl', 'csv': 'csv', 'columnar': 'columns.jsonl'}
+
+
+def plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def iter_chunks(queryset, fields, chunk_size, after=0):
+    rows = queryset.filter(pk__gt=after).order_by('pk').values_list(
+        *fields
+    ).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_header(export_format, fields):
+    if export_format != 'csv':
+        return ''
+    return render_chunk(export_format, fields, [fields])
+
+
+def render_chunk(export_format, fields, chunk):
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [plain(value) for value in row] for row in chunk
+        )
+        return buffer.getvalue()
+    if export_format == 'columnar':
+        columns = zip(*chunk)
+        return json.dumps(
+            {field: [plain(value) for value in column]
+             for field, column in zip(fields, columns)},
+            ensure_ascii=False
+        ) + '\n'
+    return ''.join(
+        json.dumps(
+            dict(zip(fields, map(plain, row))),
+            ensure_ascii=False
+        ) + '\n'
+        for row in chunk
+    )
+
+
+def stream(queryset, fields, export_format, chunk_size=2000):
+    """Отдаёт выгрузку кусками текста, по одному на пачку строк."""
+    yield render_header(export_format, fields)
+    for chunk in iter_chunks(queryset, fields, chunk_size):
+        yield render_chunk(export_format, fields, chunk)
+
+
+def stream_json(queryset, fields, chunk_size=2000):
+    """Отдаёт JSON-массив объектов, не собирая его в памяти."""
+    separator = '[\n'
+    for chunk in iter_chunks(queryset, fields, chunk_size):
+        yield separator + ',\n'.join(
+            json.dumps(dict(zip(fields, map(plain, row))), ensure_ascii=False)
+            for row in chunk
+        )
+        separator = ',\n'
+    yield '[]\n' if separator == '[\n' else '\n]\n'
@@ -0,0 +1,54 @@
+"""Подписки: повторная подписка или отписка ничего не меняет.
+
+Одиночная подписка идёт через get_or_create: гонку двух запросов ловит
+unique_follow, и get_or_create возвращает уже созданную запись. Массовая
+подписка — один INSERT с ignore_conflicts, счётчики и ленты для неё
+обновляются здесь, потому что bulk_create не вызывает сигналы.
+"""
+from django.db import transaction
+
+from . import counters, suggestions, timeline, trending
+from .models import Follow, TrendingScore
+
+BULK_LIMIT = 100
+
+
+def follow(user, author):
+    if user.pk == author.pk:
+        return False
+    _, created = Follow.objects.get_or_create(user=user, author=author)
+    return created
+
+
+def unfollow(user, author):
+    Follow.objects.filter(user=user, author=author).delete()
+
+
+def follow_many(user, author_ids):
+    """Подписывает user на всех author_ids, возвращает число новых."""
+    author_ids = set(author_ids) - {user.pk}
+    with transaction.atomic():
+        new_ids = author_ids - set(
+            Follow.objects.filter(
+                user=user,
+                author_id__in=author_ids
+            ).values_list('author_id', flat=True)
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author_id) for author_id in new_ids],
+            ignore_conflicts=True
+        )
+    if not new_ids:
+        return 0
+    # Пересчёт, а не прибавка: параллельная подписка на тех же авторов
+    # не удвоит счётчики.
+    counters.recount_follows([user.pk, *new_ids])
+    for author_id in new_ids:
+        timeline.fill_timeline(user.pk, author_id)
+        trending.record(
+            TrendingScore.AUTHOR,
+            author_id,
+            trending.FOLLOW_WEIGHT
+        )
+    suggestions.mark_stale(user.pk, new_ids)
+    return len(new_ids)
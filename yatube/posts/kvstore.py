@@ -0,0 +1,44 @@
+"""Key-value store sorl-thumbnail с пакетным чтением.
+
+Метаданные миниатюр лежат в общем кэше, а таблица sorl остаётся
+постоянным хранилищем на случай промаха. get_many достаёт миниатюры
+целой страницы одним запросом к кэшу и не больше чем одним к базе.
+Промахи не кэшируются: миниатюры создаёт другой процесс, и запомненный
+промах скрывал бы готовую картинку до истечения таймаута.
+"""
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    def _get_raw(self, key):
+        return self.get_many_raw([key]).get(key)
+
+    def get_many_raw(self, keys):
+        # EMPTY_VALUE мог остаться в кэше от стандартного cached_db.
+        values = {key: value
+                  for key, value in self.cache.get_many(keys).items()
+                  if value is not cached_db_kvstore.EMPTY_VALUE}
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing).values_list(
+                    'key',
+                    'value'
+                )
+            )
+            if stored:
+                self.cache.set_many(stored, settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(stored)
+        return values
+
+    def get_many(self, image_files):
+        """Возвращает готовые миниатюры по ключам ImageFile.key."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self.get_many_raw(list(keys))
+        return {keys[key]: deserialize_image_file(value)
+                for key, value in values.items()}
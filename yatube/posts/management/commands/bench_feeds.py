@@ -0,0 +1,131 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from posts import counters
+from posts.models import Comment, Follow, Group, Post, User
+
+FEED_INDEXES = (
+    'post_pub_date_idx',
+    'post_author_pub_date_idx',
+    'post_group_pub_date_idx',
+    'comment_post_created_idx',
+    'follow_author_user_idx',
+)
+PAGE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает планы и время запросов лент с индексами и без них. '
+        'Запускайте на отдельной базе: --seed заполняет её данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true')
+        parser.add_argument('--posts', type=int, default=2_000_000)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options)
+        queries = self.queries()
+        results = {'после': self.run(queries, options['repeat'], 'после')}
+        with transaction.atomic():
+            self.drop_indexes()
+            results['до'] = self.run(queries, options['repeat'], 'до')
+            transaction.set_rollback(True)
+        for name in queries:
+            for label in ('до', 'после'):
+                plan, latency = results[label][name]
+                self.stdout.write(f'{name} [{label}]: {latency:.2f} ms')
+                self.stdout.write(f'  {plan}')
+
+    def seed(self, options):
+        batch_size = options['batch_size']
+        User.objects.bulk_create(
+            (User(username=f'bench_{i}') for i in range(options['users'])),
+            batch_size=batch_size
+        )
+        Group.objects.bulk_create(
+            (Group(title=f'Группа {i}', slug=f'bench-{i}', description='')
+             for i in range(options['groups'])),
+            batch_size=batch_size
+        )
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        group_ids = list(Group.objects.values_list('pk', flat=True))
+        for start in range(0, options['posts'], batch_size):
+            stop = min(start + batch_size, options['posts'])
+            Post.objects.bulk_create(
+                Post(
+                    author_id=user_ids[i % len(user_ids)],
+                    group_id=group_ids[i % len(group_ids)],
+                    text=f'Пост {i}'
+                )
+                for i in range(start, stop)
+            )
+            self.stdout.write(f'Создано постов: {stop}')
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_ids[i], author_id=user_ids[0])
+             for i in range(1, len(user_ids))),
+            batch_size=batch_size,
+            ignore_conflicts=True
+        )
+        counters.recount()
+
+    def queries(self):
+        bounds = Post.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            raise CommandError('Нет постов, запустите команду с --seed')
+        post = Post.objects.filter(
+            pk__gte=(bounds['first'] + bounds['last']) // 2
+        ).order_by('pk').first()
+        group_id = Group.objects.values_list('pk', flat=True).first()
+        feed = Post.objects.for_feed().order_by('-pub_date', '-pk')
+        return {
+            'index': feed[:PAGE_SIZE],
+            'group_posts': feed.filter(group_id=group_id)[:PAGE_SIZE],
+            'profile': feed.filter(author_id=post.author_id)[:PAGE_SIZE],
+            'deep_cursor': feed.filter(pub_date__lt=post.pub_date)[:PAGE_SIZE],
+            'comments': Comment.objects.filter(post=post)[:PAGE_SIZE],
+            'followers': Follow.objects.filter(
+                author_id=post.author_id
+            ).values_list('user_id', flat=True),
+        }
+
+    def explain(self, queryset, label):
+        # Метка делает текст запроса уникальным: иначе sqlite3 отдаёт
+        # план из кэша подготовленных выражений, составленный до DROP INDEX.
+        sql, params = queryset.query.sql_with_params()
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql} /* {label} */', params)
+            return ' '.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+
+    def run(self, queries, repeat, label):
+        results = {}
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            plan = self.explain(queryset, label)
+            results[name] = (plan, statistics.median(timings))
+        return results
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for name in FEED_INDEXES:
+                cursor.execute(
+                    f'DROP INDEX {connection.ops.quote_name(name)}'
+                )
@@ -0,0 +1,68 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import trending
+from posts.models import TrendingScore
+
+# id вне диапазона настоящих постов, всё равно всё откатывается.
+FIRST_ID = 10 ** 9
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет стоимость учёта одного события в популярном, выборки '
+        'топа и compact_trending. Все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=20_000)
+        parser.add_argument('--objects', type=int, default=2_000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        with transaction.atomic():
+            inserts = self.record(range(options['objects']), now)
+            updates = self.record(
+                (random.randrange(options['objects'])
+                 for _ in range(options['events'])),
+                now
+            )
+            started = time.perf_counter()
+            list(trending.ranked(TrendingScore.POST).order_by('-score')[:10])
+            top = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            deleted = trending.compact(now + timedelta(days=30))
+            compaction = (time.perf_counter() - started) * 1000
+            transaction.set_rollback(True)
+        for label, timings in (('новая запись', inserts),
+                               ('обновление', updates)):
+            timings.sort()
+            self.stdout.write(
+                f'{label}: медиана {statistics.median(timings):.3f} ms, '
+                f'p95 {timings[int(len(timings) * 0.95)]:.3f} ms, '
+                f'{len(timings) / (sum(timings) / 1000):.0f} событий/с'
+            )
+        self.stdout.write(f'топ-10: {top:.2f} ms')
+        self.stdout.write(
+            f'compact_trending через 30 дней: {compaction:.1f} ms, '
+            f'удалено {deleted}'
+        )
+
+    def record(self, offsets, now):
+        timings = []
+        for offset in offsets:
+            started = time.perf_counter()
+            trending.record(
+                TrendingScore.POST,
+                FIRST_ID + offset,
+                trending.COMMENT_WEIGHT,
+                now
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
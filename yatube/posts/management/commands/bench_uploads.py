@@ -0,0 +1,87 @@
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from posts.uploads import normalize_image
+
+SIZES = ((1280, 960), (4000, 3000), (6000, 4000))
+CARD_SIZE = (960, 339)
+EXIF_ORIENTATION = 0x0112
+
+
+def make_photo(width, height):
+    # Плавные пятна сжимаются примерно как фотография, чистый шум — нет.
+    image = Image.merge('RGB', [
+        Image.effect_noise((width // 16, height // 16), 64).resize(
+            (width, height), Image.BICUBIC
+        )
+        for _ in range(3)
+    ])
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=90, exif=exif)
+    return output.getvalue()
+
+
+def decode_card(data):
+    image = Image.open(BytesIO(data))
+    image.load()
+    image.thumbnail(CARD_SIZE)
+    return len(data)
+
+
+def normalize(data):
+    upload = SimpleUploadedFile('photo.jpg', data, 'image/jpeg')
+    return normalize_image(upload).size
+
+
+def measure(function, data):
+    # Запускается в отдельном процессе: пик RSS не смешивается с другими
+    # замерами и с памятью родителя.
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu_started = time.process_time()
+    result = function(data)
+    cpu = (time.process_time() - cpu_started) * 1000
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    return result, cpu, peak / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет процессорное время и пик памяти на нормализацию '
+        'загружаемой картинки и на декодирование оригинала и результата.'
+    )
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        for width, height in SIZES:
+            photo = make_photo(width, height)
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                size, cpu, peak = executor.submit(
+                    measure, normalize, photo
+                ).result()
+            normalized = normalize_image(
+                SimpleUploadedFile('photo.jpg', photo, 'image/jpeg')
+            ).read()
+            self.stdout.write(
+                f'{width}x{height}: {len(photo) // 1024} КБ -> '
+                f'{size // 1024} КБ, нормализация {cpu:.0f} ms, '
+                f'пик памяти {peak:.1f} МБ'
+            )
+            samples = {'оригинал': photo, 'результат': normalized}
+            for label, data in samples.items():
+                with ProcessPoolExecutor(1, mp_context=context) as executor:
+                    _, cpu, peak = executor.submit(
+                        measure, decode_card, data
+                    ).result()
+                self.stdout.write(
+                    f'  декодирование для карточки, {label}: {cpu:.0f} ms, '
+                    f'пик памяти {peak:.1f} МБ'
+                )
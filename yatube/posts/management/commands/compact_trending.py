@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из популярного остывшие записи и записи удалённых '
+        'объектов. Запускайте периодически, например раз в час.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Удалено записей: {trending.compact()}')
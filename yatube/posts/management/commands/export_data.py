@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts import export
+
+CHECKPOINT = 'checkpoint.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки в каталог. С --resume '
+        'продолжает с id, записанных в checkpoint.json.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--tables',
+            nargs='+',
+            choices=export.TABLES,
+            default=list(export.TABLES)
+        )
+        parser.add_argument(
+            '--format',
+            choices=export.CONTENT_TYPES,
+            default='jsonl'
+        )
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--resume', action='store_true')
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Например, реплика, чтобы не нагружать основную базу'
+        )
+
+    def handle(self, *args, **options):
+        os.makedirs(options['directory'], exist_ok=True)
+        self.checkpoint_path = os.path.join(options['directory'], CHECKPOINT)
+        checkpoint = {}
+        if options['resume'] and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as stream:
+                checkpoint = json.load(stream)
+        else:
+            self.save_checkpoint(checkpoint)
+        for table in options['tables']:
+            checkpoint[table] = self.export_table(
+                table,
+                checkpoint,
+                options
+            )
+
+    def export_table(self, table, checkpoint, options):
+        model, fields = export.TABLES[table]
+        export_format = options['format']
+        path = os.path.join(
+            options['directory'],
+            f'{table}.{export.EXTENSIONS[export_format]}'
+        )
+        after = checkpoint.get(table, 0)
+        mode = 'at' if after else 'wt'
+        if options['gzip']:
+            # Дописывание в .gz добавляет новый gzip-поток, такой файл
+            # целиком читают gunzip и gzip.open.
+            output = gzip.open(f'{path}.gz', mode, encoding='utf-8')
+        else:
+            output = open(path, mode, encoding='utf-8', newline='')
+        exported = 0
+        with output:
+            if not after:
+                output.write(export.render_header(export_format, fields))
+            for chunk in export.iter_chunks(
+                model.objects.using(options['database']),
+                fields,
+                options['chunk_size'],
+                after
+            ):
+                output.write(export.render_chunk(export_format, fields, chunk))
+                output.flush()
+                after = chunk[-1][0]
+                exported += len(chunk)
+                # Сбой между записью и checkpoint повторит последнюю
+                # пачку при --resume, но не потеряет строки.
+                self.save_checkpoint({**checkpoint, table: after})
+        self.stdout.write(f'{table}: выгружено строк {exported}')
+        return after
+
+    def save_checkpoint(self, checkpoint):
+        temporary = f'{self.checkpoint_path}.tmp'
+        with open(temporary, 'w') as stream:
+            json.dump(checkpoint, stream)
+        os.replace(temporary, self.checkpoint_path)
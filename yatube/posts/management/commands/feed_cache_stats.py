@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import page_cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша страниц лент'
+
+    def handle(self, *args, **options):
+        stats = page_cache.stats()
+        total = sum(stats.values())
+        for outcome, count in stats.items():
+            share = count / total * 100 if total else 0
+            self.stdout.write(f'{outcome}: {count} ({share:.1f}%)')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import threads
+
+
+class Command(BaseCommand):
+    help = (
+        'Достраивает пути веток комментариям, созданным в обход сигналов '
+        '(bulk_create)'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            filled = threads.fill_paths()
+        self.stdout.write(f'Исправлено комментариев: {filled}')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Нарезает недостающие миниатюры для картинок постов'
+
+    def handle(self, *args, **options):
+        count = 0
+        for post in Post.objects.exclude(image='').only(
+            'pk',
+            'image',
+            'group_id'
+        ).iterator():
+            ready = all(
+                thumbnails.ready_thumbnail(post.image, size)
+                for size in thumbnails.THUMBNAILS
+            )
+            if not ready:
+                thumbnails.generate_thumbnails(post.pk)
+                count += 1
+        self.stdout.write(f'Нарезано миниатюр для постов: {count}')
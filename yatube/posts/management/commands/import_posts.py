@@ -0,0 +1,184 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import blobs, counters, page_cache, search, timeline
+from posts.models import Group, Post, User
+from posts.uploads import normalize_image
+
+FORMATS = ('jsonl', 'csv')
+
+
+class RowError(Exception):
+    pass
+
+
+@contextmanager
+def explicit_pub_date():
+    # auto_now_add перезаписывает pub_date и в bulk_create, а при переносе
+    # постов нужны исходные даты. Команда однопоточная, флаг возвращается
+    # сразу после импорта.
+    field = Post._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def read_rows(stream, input_format):
+    if input_format == 'csv':
+        yield from enumerate(csv.DictReader(stream), start=2)
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as error:
+                yield line_number, error
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из JSONL или CSV с полями text, author '
+        '(username), group (slug), pub_date и image (файл из --images).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--images', help='Каталог с картинками')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or os.path.splitext(path)[1][1:]
+        if input_format not in FORMATS:
+            raise CommandError('Укажите --format: jsonl или csv')
+        self.images = options['images']
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.image_storage = blobs.image_field.storage
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.author_counts = Counter()
+        self.group_counts = Counter()
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+        with stream, explicit_pub_date():
+            imported, skipped = self.import_rows(
+                read_rows(stream, input_format),
+                options['batch_size']
+            )
+        self.finish(last_pk, options['batch_size'])
+        self.stdout.write(
+            f'Импортировано постов: {imported}, пропущено строк: {skipped}'
+        )
+
+    def import_rows(self, rows, batch_size):
+        imported = skipped = 0
+        started = time.perf_counter()
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                return imported, skipped
+            batch = []
+            images = Counter()
+            for line_number, row in chunk:
+                try:
+                    batch.append(self.build_post(row))
+                except RowError as error:
+                    self.stderr.write(f'Строка {line_number}: {error}')
+                    skipped += 1
+                    continue
+                if batch[-1].image:
+                    images[batch[-1].image.name] += 1
+            with transaction.atomic():
+                Post.objects.bulk_create(batch)
+                for name, count in images.items():
+                    blobs.retain(name, count)
+            for post in batch:
+                self.author_counts[post.author_id] += 1
+                self.group_counts[post.group_id] += 1
+            imported += len(batch)
+            rate = imported / (time.perf_counter() - started)
+            self.stdout.write(f'{imported} постов, {rate:.0f} строк/с')
+
+    def build_post(self, row):
+        if isinstance(row, Exception):
+            raise RowError(row)
+        if not isinstance(row, dict):
+            raise RowError('ожидается объект JSON')
+        text = (row.get('text') or '').strip()
+        if not text:
+            raise RowError('пустой текст')
+        author_id = self.authors.get(row.get('author'))
+        if author_id is None:
+            raise RowError(f'нет автора {row.get("author")!r}')
+        group_id = None
+        if row.get('group'):
+            group_id = self.groups.get(row['group'])
+            if group_id is None:
+                raise RowError(f'нет группы {row["group"]!r}')
+        pub_date = timezone.now()
+        if row.get('pub_date'):
+            pub_date = parse_datetime(row['pub_date'])
+            if pub_date is None:
+                raise RowError(f'неверная дата {row["pub_date"]!r}')
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+        return Post(
+            text=text,
+            author_id=author_id,
+            group_id=group_id,
+            pub_date=pub_date,
+            image=self.save_image(row.get('image'))
+        )
+
+    def save_image(self, name):
+        if not name:
+            return ''
+        if not self.images:
+            raise RowError('картинка без --images')
+        path = os.path.join(self.images, name)
+        try:
+            with open(path, 'rb') as image:
+                normalized = normalize_image(File(image, name))
+        except OSError as error:
+            raise RowError(error)
+        except ValidationError as error:
+            raise RowError(' '.join(error.messages))
+        return self.image_storage.save(
+            os.path.join(blobs.image_field.upload_to, normalized.name),
+            normalized
+        )
+
+    def finish(self, last_pk, batch_size):
+        # bulk_create не вызывает сигналы: счётчики, ленты подписок,
+        # поисковый индекс и кэш лент обновляются здесь.
+        imported = Post.objects.filter(pk__gt=last_pk)
+        for author_id, count in self.author_counts.items():
+            counters.bump_user(author_id, 'posts_count', count)
+        for group_id, count in self.group_counts.items():
+            counters.bump(Group, group_id, 'posts_count', count)
+        timeline.fan_out_posts(imported)
+        search.reindex(batch_size, imported)
+        page_cache.invalidate_post_feeds(*self.group_counts)
+        if imported.exclude(image='').exists():
+            self.stdout.write(
+                'Миниатюры нарежет команда generate_thumbnails'
+            )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, TimelineBackfill, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из Follow и Post'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Пересобрать ленты только этих пользователей'
+        )
+        parser.add_argument(
+            '--pending',
+            action='store_true',
+            help='Только разложить посты авторов из очереди TimelineBackfill'
+        )
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            count = timeline.backfill_pending()
+            self.stdout.write(f'Разложены посты авторов: {count}')
+            return
+        follows = Follow.objects.all()
+        entries = TimelineEntry.objects.all()
+        if options['usernames']:
+            follows = follows.filter(user__username__in=options['usernames'])
+            entries = entries.filter(user__username__in=options['usernames'])
+        with transaction.atomic():
+            if not options['usernames']:
+                TimelineBackfill.objects.all().delete()
+            entries.delete()
+            count = 0
+            for follow in follows.iterator():
+                timeline.fill_timeline(follow.user_id, follow.author_id)
+                count += 1
+        self.stdout.write(f'Пересобрано подписок: {count}')
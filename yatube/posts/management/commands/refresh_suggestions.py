@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «кого почитать» для пользователей, '
+        'чьи подписки изменились, а с --full — для всех.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        refreshed = suggestions.refresh(
+            options['full'],
+            options['batch_size']
+        )
+        self.stdout.write(
+            f'Пересчитано пользователей: {refreshed} '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+from posts.models import SearchIndexChange
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс по всем постам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        # Изменения, записанные до начала, перекроет полная переиндексация.
+        last_change = SearchIndexChange.objects.order_by('-pk').first()
+        count = search.reindex(options['chunk_size'])
+        if last_change is not None:
+            SearchIndexChange.objects.filter(pk__lte=last_change.pk).delete()
+        self.stdout.write(f'Проиндексировано постов: {count}')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит журнал изменений постов в поисковый индекс. '
+        'Нужна при SEARCH_INDEXER=background.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true')
+        parser.add_argument('--interval', type=float, default=2)
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        while True:
+            processed = search.process_changes(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Проиндексировано изменений: {processed}')
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_trending_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stalesuggestions',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Версия отметки'),
+        ),
+    ]
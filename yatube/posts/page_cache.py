@@ -0,0 +1,145 @@
+"""Кэш страниц публичных лент для анонимных читателей.
+
+Страница хранится вместе с поколением своей ленты. Создание, правка и
+удаление поста увеличивают поколение главной ленты и ленты группы, и
+закэшированные страницы становятся устаревшими. Устаревшую или
+отсутствующую страницу перерисовывает только один запрос, захвативший
+блокировку. Остальные в это время получают устаревшую копию
+(stale-while-revalidate), а если копии нет — недолго ждут новую и
+только потом рисуют страницу сами, не сохраняя её.
+"""
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import cache_keys
+from .models import Group
+
+INDEX_SCOPE = 'index'
+HIT = 'hit'
+STALE = 'stale'
+MISS = 'miss'
+LOCK_POLL_INTERVAL = 0.05
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def get_generation(scope):
+    return cache.get(cache_keys.feed_generation(scope), 0)
+
+
+def increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate(*scopes):
+    for scope in scopes:
+        increment(cache_keys.feed_generation(scope))
+
+
+def invalidate_post_feeds(*group_ids):
+    group_ids = [group_id for group_id in group_ids if group_id is not None]
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug',
+        flat=True
+    ) if group_ids else []
+    invalidate(INDEX_SCOPE, *(group_scope(slug) for slug in slugs))
+
+
+def record(outcome):
+    increment(cache_keys.feed_stats(outcome))
+
+
+def stats():
+    keys = {cache_keys.feed_stats(outcome): outcome
+            for outcome in (HIT, STALE, MISS)}
+    values = cache.get_many(keys)
+    return {outcome: values.get(key, 0) for key, outcome in keys.items()}
+
+
+def render_and_store(view, request, args, kwargs, key, scope):
+    generation = get_generation(scope)
+    response = view(request, *args, **kwargs)
+    if response.status_code == 200 and not response.cookies:
+        cache.set(
+            key,
+            {
+                'generation': generation,
+                'fresh_until': time.time() + settings.FEED_CACHE_TIMEOUT,
+                'content': response.content,
+                'content_type': response['Content-Type'],
+            },
+            settings.FEED_CACHE_TIMEOUT + settings.FEED_CACHE_STALE_TIMEOUT
+        )
+    return response
+
+
+def wait_for_entry(key):
+    deadline = time.monotonic() + settings.FEED_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def cached_response(entry, outcome):
+    response = HttpResponse(
+        entry['content'],
+        content_type=entry['content_type']
+    )
+    response['X-Feed-Cache'] = outcome
+    return response
+
+
+def feed_cache(scope_for):
+    """Кэширует ленту; scope_for(**kwargs) выбирает её поколение."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            scope = scope_for(**kwargs)
+            full_path = request.get_full_path()
+            key = cache_keys.feed_page(scope, full_path)
+            lock_key = cache_keys.feed_page_lock(scope, full_path)
+            generation_key = cache_keys.feed_generation(scope)
+            cached = cache.get_many([key, generation_key])
+            entry = cached.get(key)
+            if (entry is not None
+                    and entry['generation'] == cached.get(generation_key, 0)
+                    and entry['fresh_until'] > time.time()):
+                record(HIT)
+                return cached_response(entry, HIT)
+            if not cache.add(
+                lock_key, True, settings.FEED_CACHE_LOCK_TIMEOUT
+            ):
+                if entry is not None:
+                    record(STALE)
+                    return cached_response(entry, STALE)
+                entry = wait_for_entry(key)
+                if entry is not None:
+                    record(HIT)
+                    return cached_response(entry, HIT)
+                response = view(request, *args, **kwargs)
+            else:
+                try:
+                    response = render_and_store(
+                        view, request, args, kwargs, key, scope
+                    )
+                finally:
+                    cache.delete(lock_key)
+            record(MISS)
+            response['X-Feed-Cache'] = MISS
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,205 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, *values):
+    raw = '|'.join([direction, *map(str, values)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор, для испорченного значения возвращает None."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, *values = raw.decode().split('|')
+    except (binascii.Error, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    return direction, values
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Стоимость любой страницы одинакова: выборка идёт по индексу
+    от позиции курсора, а не пропуском предыдущих записей.
+    """
+
+    cursor_mode = True
+    key_field = 'pub_date'
+    tie_field = 'pk'
+
+    def __init__(self, object_list, per_page):
+        super().__init__(
+            object_list.order_by(f'-{self.key_field}', f'-{self.tie_field}'),
+            per_page
+        )
+
+    def cursor_values(self, obj):
+        return (
+            getattr(obj, self.key_field).isoformat(),
+            getattr(obj, self.tie_field)
+        )
+
+    def parse_key(self, value):
+        key = parse_datetime(value)
+        if key is None:
+            raise ValueError(value)
+        return key
+
+    def parse_cursor(self, cursor):
+        """(направление, ключ, id) из курсора или None."""
+        decoded = decode_cursor(cursor)
+        try:
+            direction, (key, pk) = decoded
+            return direction, self.parse_key(key), int(pk)
+        except (TypeError, ValueError):
+            return None
+
+    def seek(self, queryset, direction, key, pk, tie_field=None):
+        """Записи queryset после позиции курсора в порядке обхода."""
+        field = self.key_field
+        tie_field = tie_field or self.tie_field
+        if direction == NEXT:
+            return queryset.filter(
+                Q(**{f'{field}__lt': key})
+                | Q(**{field: key, f'{tie_field}__lt': pk})
+            )
+        return queryset.filter(
+            Q(**{f'{field}__gt': key})
+            | Q(**{field: key, f'{tie_field}__gt': pk})
+        ).order_by(field, tie_field)
+
+    def get_page(self, cursor):
+        position = self.parse_cursor(cursor)
+        if position is None:
+            return self._cursor_page(self.object_list, None)
+        return self._cursor_page(
+            self.seek(self.object_list, *position),
+            position[0]
+        )
+
+    def _cursor_page(self, queryset, direction):
+        return self.make_page(list(queryset[:self.per_page + 1]), direction)
+
+    def make_page(self, rows, direction):
+        """Страница из per_page + 1 строк в порядке обхода."""
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, direction == NEXT
+        page = Page(rows, 1, self)
+        page.next_cursor = (
+            encode_cursor(NEXT, *self.cursor_values(rows[-1]))
+            if has_next and rows else None
+        )
+        page.previous_cursor = (
+            encode_cursor(PREVIOUS, *self.cursor_values(rows[0]))
+            if has_previous and rows else None
+        )
+        return page
+
+
+class SearchPaginator(CursorPaginator):
+    """Выдача поиска: ключ — релевантность score, при равенстве — id."""
+
+    key_field = 'score'
+
+    def cursor_values(self, obj):
+        return repr(obj.score), obj.pk
+
+    def parse_key(self, value):
+        return float(value)
+
+
+class TrendingPaginator(SearchPaginator):
+    """Популярное: ключ — score записи TrendingScore, при равенстве — id.
+
+    Страницы читаются по живому индексу без снимка. Score поста между
+    событиями не меняется, а события его только увеличивают, поэтому
+    показанный пост остаётся выше курсора и не повторяется. Пост, который
+    набрал вес после загрузки предыдущей страницы, может перескочить выше
+    курсора и не попасть в выдачу до перезагрузки первой страницы.
+    """
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок по индексу TimelineEntry (user, -pub_date, -post).
+
+    Строки страницы — пары (pub_date, post_id), посты по ним вьюха читает
+    отдельным запросом. Посты знаменитостей в ленты не раскладываются:
+    celebrity_posts читаются вторым диапазоном по индексу постов автора
+    и сливаются со строками ленты.
+    """
+
+    tie_field = 'post_id'
+
+    def __init__(self, entries, per_page, celebrity_posts=None):
+        super().__init__(entries, per_page)
+        self.sources = [
+            (self.object_list.values_list('pub_date', 'post_id'), 'post_id')
+        ]
+        if celebrity_posts is not None:
+            self.sources.append((
+                celebrity_posts.order_by('-pub_date', '-pk').values_list(
+                    'pub_date',
+                    'pk'
+                ),
+                'pk'
+            ))
+
+    def cursor_values(self, row):
+        return row[0].isoformat(), row[1]
+
+    def get_page(self, cursor):
+        position = self.parse_cursor(cursor)
+        direction = position and position[0]
+        rows = []
+        for queryset, tie_field in self.sources:
+            if position is not None:
+                queryset = self.seek(queryset, *position, tie_field=tie_field)
+            rows.extend(queryset[:self.per_page + 1])
+        # Пост автора из очереди раскладки может прийти из обоих диапазонов.
+        rows = sorted(set(rows), reverse=direction != PREVIOUS)
+        return self.make_page(rows[:self.per_page + 1], direction)
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста, новые сверху: ключ (created, id)."""
+
+    key_field = 'created'
+
+
+class FollowPaginator(CursorPaginator):
+    """Подписчики и подписки, новые сверху: ключ — id записи Follow."""
+
+    key_field = 'id'
+
+    def cursor_values(self, obj):
+        return obj.pk, obj.pk
+
+    def parse_key(self, value):
+        return int(value)
+
+
+def paginate(request, queryset, per_page):
+    """Номер страницы в ?page= оставлен для старых ссылок."""
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return Paginator(queryset, per_page).get_page(page_number)
+    return CursorPaginator(queryset, per_page).get_page(
+        request.GET.get('cursor')
+    )
@@ -0,0 +1,180 @@
+"""Полнотекстовый поиск по постам.
+
+SQLite: виртуальная таблица FTS5 с основами слов (см. stemmer). Сигналы
+постов пишут изменения в журнал SearchIndexChange, а process_changes
+переносит их в индекс пачками: сразу (SEARCH_INDEXER='inline') или в
+отдельном процессе search_indexer. Ранжирование по bm25.
+PostgreSQL: GIN-индекс по выражению to_tsvector('russian', text), его
+база поддерживает сама. Ранжирование по ts_rank.
+На остальных базах поиск сводится к icontains без ранжирования.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Post, SearchIndexChange
+from .stemmer import WORD, stems
+
+FTS_TABLE = 'posts_post_fts'
+POST_TABLE = Post._meta.db_table
+PG_DOCUMENT = f"to_tsvector('russian', {POST_TABLE}.text)"
+PG_QUERY = "plainto_tsquery('russian', %s)"
+
+
+def search_terms(query):
+    return WORD.findall(query)[:settings.SEARCH_MAX_TERMS]
+
+
+def index_document(text):
+    return ' '.join(stems(text))
+
+
+def remove_documents(cursor, post_ids):
+    cursor.executemany(
+        f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+        [(post_id,) for post_id in post_ids]
+    )
+
+
+def insert_documents(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+        [(pk, index_document(text)) for pk, text in rows]
+    )
+
+
+def log_change(post_id):
+    """Ставит пост в очередь на переиндексацию.
+
+    На PostgreSQL индекс по выражению обновляет сама база, журнал не нужен.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    if settings.SEARCH_INDEXER == 'inline':
+        transaction.on_commit(lambda: index_post(post_id))
+        return
+    SearchIndexChange.objects.create(post_id=post_id)
+
+
+def index_post(post_id):
+    """Переиндексирует один пост; документ удалённого поста удаляется."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        remove_documents(cursor, [post_id])
+        insert_documents(
+            cursor,
+            Post.objects.filter(pk=post_id).values_list('pk', 'text')
+        )
+
+
+def process_changes(batch_size=None):
+    """Переносит журнал в индекс пачками, возвращает число записей."""
+    batch_size = batch_size or settings.SEARCH_INDEX_BATCH_SIZE
+    processed = 0
+    while True:
+        with transaction.atomic():
+            changes = dict(
+                SearchIndexChange.objects.order_by('pk').values_list(
+                    'pk',
+                    'post_id'
+                )[:batch_size]
+            )
+            if not changes:
+                return processed
+            post_ids = set(changes.values())
+            rows = Post.objects.filter(pk__in=post_ids).values_list(
+                'pk',
+                'text'
+            )
+            with connection.cursor() as cursor:
+                remove_documents(cursor, post_ids)
+                insert_documents(cursor, rows)
+            SearchIndexChange.objects.filter(pk__in=changes).delete()
+        processed += len(changes)
+
+
+def reindex(chunk_size, posts=None):
+    """Переиндексирует посты, читая таблицу потоком по chunk_size.
+
+    Без posts индексируются все посты, а документы удалённых постов
+    вычищаются из индекса.
+    """
+    if connection.vendor != 'sqlite':
+        return 0
+    full = posts is None
+    if full:
+        posts = Post.objects.all()
+    rows = posts.order_by().values_list('pk', 'text').iterator(
+        chunk_size=chunk_size
+    )
+    count = 0
+    with connection.cursor() as cursor:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                remove_documents(cursor, [pk for pk, _ in chunk])
+                insert_documents(cursor, chunk)
+            count += len(chunk)
+        if full:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid NOT IN '
+                f'(SELECT id FROM {POST_TABLE})'
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+            )
+    return count
+
+
+def search_posts(queryset, query, ranked=True):
+    """Отбирает посты по запросу и добавляет релевантность score.
+
+    bm25 в SQLite работает только в запросе с MATCH, поэтому по выдаче
+    с ranked=True нельзя делать count(). Админке ранжирование не нужно,
+    она получает ranked=False: фильтр по id из индекса, без score.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none().annotate(score=Value(0, FloatField()))
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"' for term in stems(' '.join(terms)))
+        if not ranked:
+            return queryset.extra(
+                where=[
+                    f'{POST_TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s)'
+                ],
+                params=[match]
+            )
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {POST_TABLE}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[match]
+        ).annotate(
+            score=RawSQL(f'-bm25({FTS_TABLE})', (), FloatField())
+        )
+    if connection.vendor == 'postgresql':
+        text = ' '.join(terms)
+        queryset = queryset.extra(
+            where=[f'{PG_DOCUMENT} @@ {PG_QUERY}'],
+            params=[text]
+        )
+        if not ranked:
+            return queryset
+        return queryset.annotate(
+            score=RawSQL(
+                f'ts_rank({PG_DOCUMENT}, {PG_QUERY})',
+                (text,),
+                FloatField()
+            )
+        )
+    for term in terms:
+        queryset = queryset.filter(text__icontains=term)
+    return queryset.annotate(score=Value(0, FloatField()))
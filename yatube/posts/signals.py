@@ -0,0 +1,149 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    blobs,
+    counters,
+    page_cache,
+    search,
+    suggestions,
+    threads,
+    timeline,
+    trending
+)
+from .models import (
+    Comment,
+    Follow,
+    Group,
+    Post,
+    TrendingScore,
+    User,
+    UserCounters
+)
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    previous = None
+    if instance.pk is not None:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id',
+            'image'
+        ).first()
+    instance._previous_group_id, instance._previous_image = (
+        previous or (None, '')
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump(Group, instance.group_id, 'posts_count', 1)
+        timeline.fan_out_post(instance)
+        trending.record(
+            TrendingScore.GROUP,
+            instance.group_id,
+            trending.POST_WEIGHT
+        )
+    elif instance._previous_group_id != instance.group_id:
+        counters.bump(Group, instance._previous_group_id, 'posts_count', -1)
+        counters.bump(Group, instance.group_id, 'posts_count', 1)
+        trending.move_post(instance, instance._previous_group_id)
+    if instance._previous_image != instance.image.name:
+        blobs.retain(instance.image.name)
+        blobs.release(instance._previous_image)
+    search.log_change(instance.pk)
+    page_cache.invalidate_post_feeds(
+        instance.group_id,
+        instance._previous_group_id
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump(Group, instance.group_id, 'posts_count', -1)
+    blobs.release(instance.image.name)
+    search.log_change(instance.pk)
+    trending.forget(TrendingScore.POST, instance.pk)
+    page_cache.invalidate_post_feeds(instance.group_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    page_cache.invalidate(
+        page_cache.INDEX_SCOPE,
+        page_cache.group_scope(instance.slug)
+    )
+
+
+@receiver(pre_save, sender=Comment)
+def comment_placing(sender, instance, **kwargs):
+    if instance.pk is None and instance.parent_id:
+        instance.parent = threads.reply_parent(instance.parent)
+        instance.root_id = instance.parent.root_id or instance.parent_id
+
+
+def comment_group_id(comment):
+    # Вьюха добавления комментария уже загрузила пост.
+    if Comment.post.is_cached(comment):
+        return comment.post.group_id
+    return Post.objects.filter(pk=comment.post_id).values_list(
+        'group_id',
+        flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(Post, instance.post_id, 'comments_count', 1)
+        trending.record(
+            TrendingScore.POST,
+            instance.post_id,
+            trending.COMMENT_WEIGHT
+        )
+        trending.record(
+            TrendingScore.GROUP,
+            comment_group_id(instance),
+            trending.COMMENT_WEIGHT
+        )
+        # Путь включает id, поэтому записывается после вставки.
+        instance.path = threads.make_path(instance)
+        Comment.objects.filter(pk=instance.pk).update(path=instance.path)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        timeline.fill_timeline(instance.user_id, instance.author_id)
+        suggestions.mark_stale(instance.user_id, [instance.author_id])
+        trending.record(
+            TrendingScore.AUTHOR,
+            instance.author_id,
+            trending.FOLLOW_WEIGHT
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    timeline.clear_timeline(instance.user_id, instance.author_id)
+    timeline.follower_lost(instance.author_id)
+    suggestions.mark_stale(instance.user_id)
@@ -0,0 +1,121 @@
+"""Стеммер Портера (Snowball) для русского языка.
+
+В SQLite нет русского токенизатора, поэтому текст постов и поисковые
+запросы приводятся к основам здесь, до записи в индекс FTS5.
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile('[а-я]')
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+     'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+     'ья', 'я'),
+)
+DERIVATIONAL = ((), ('ост', 'ость'))
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+
+
+def region_after_consonant(word, start):
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def regions(word):
+    rv = next(
+        (i + 1 for i, letter in enumerate(word) if letter in VOWELS),
+        len(word)
+    )
+    r1 = region_after_consonant(word, 0)
+    r2 = region_after_consonant(word, r1)
+    return rv, r2
+
+
+@lru_cache(maxsize=None)
+def candidates(endings):
+    after_a, plain = endings
+    return sorted(
+        [(ending, True) for ending in after_a]
+        + [(ending, False) for ending in plain],
+        key=lambda candidate: -len(candidate[0])
+    )
+
+
+def remove_ending(word, start, endings):
+    """Удаляет самое длинное окончание, начинающееся не раньше start.
+
+    endings[0] — окончания, перед которыми должна стоять «а» или «я»;
+    такое окончание удаляется без этой буквы.
+    """
+    for ending, needs_a in candidates(endings):
+        if not word.endswith(ending) or len(word) - len(ending) < start:
+            continue
+        stem = word[:-len(ending)]
+        if needs_a and not (stem[-1:] in ('а', 'я') and len(stem) > start):
+            return None
+        return stem
+    return None
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    rv, r2 = regions(word)
+    stemmed = remove_ending(word, rv, PERFECTIVE_GERUND)
+    if stemmed is None:
+        word = remove_ending(word, rv, REFLEXIVE) or word
+        stemmed = remove_ending(word, rv, ADJECTIVE)
+        if stemmed is not None:
+            stemmed = remove_ending(stemmed, rv, PARTICIPLE) or stemmed
+        else:
+            stemmed = (
+                remove_ending(word, rv, VERB)
+                or remove_ending(word, rv, NOUN)
+            )
+    word = stemmed if stemmed is not None else word
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = remove_ending(word, r2, DERIVATIONAL) or word
+    without_superlative = remove_ending(word, rv, SUPERLATIVE)
+    if without_superlative is not None:
+        word = without_superlative
+    elif word.endswith('ь') and len(word) - 1 >= rv:
+        return word[:-1]
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+def stems(text):
+    return [stem(word) for word in WORD.findall(text)]
@@ -0,0 +1,45 @@
+"""Хранилище картинок постов с именами по содержимому.
+
+Файл называется SHA-256 своего содержимого, поэтому одинаковые загрузки
+получают одно имя и записываются на диск один раз. Миниатюры sorl
+строятся по имени исходника и тоже достаются всем копиям сразу.
+
+Файл пишется под временным именем (FileSystemStorage создаёт его с
+O_EXCL) и появляется под своим именем через link: это атомарно и не
+заменяет файл, который параллельная загрузка того же содержимого успела
+положить раньше.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name),
+            digest[:2],
+            digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        temp_name = super().save(f'{name}.part', content, max_length)
+        try:
+            os.link(self.path(temp_name), self.path(name))
+        except FileExistsError:
+            pass
+        finally:
+            self.delete(temp_name)
+        return name
@@ -0,0 +1,254 @@
+"""Рекомендации «кого почитать», рассчитанные заранее.
+
+Команда refresh_suggestions строит граф подписок и групп в памяти и
+складывает для каждого пользователя веса кандидатов:
+
+* друзья друзей — авторы, на которых подписаны те, кого он читает;
+* совместные подписки — авторы, которых читают вместе с его авторами
+  (косинусная близость множеств подписчиков);
+* общие группы — авторы, которые пишут в те же группы, что и он.
+
+Это произведения разреженных матриц смежности, посчитанные по спискам
+смежности. Страницы читают готовую таблицу FollowSuggestion одним
+запросом по индексу (user, -score). Подписка и отписка помечают
+пользователя в StaleSuggestions, а обычный запуск команды пересчитывает
+только помеченных, читая для каждой пачки лишь её окрестность графа.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import (
+    Follow,
+    FollowSuggestion,
+    Post,
+    StaleSuggestions,
+    User,
+    UserCounters
+)
+
+FRIENDS_WEIGHT = 1.0
+CO_FOLLOW_WEIGHT = 2.0
+GROUP_WEIGHT = 0.5
+# Похожих авторов ищем не больше чем по стольким подписчикам, иначе
+# популярный автор тянет за собой весь граф.
+CO_FOLLOW_SAMPLE = 200
+FOLLOW_TABLE = Follow._meta.db_table
+# Последние подписчики каждого автора: ROW_NUMBER режет выборку в базе,
+# и подписчики знаменитости не читаются целиком.
+FOLLOWER_SAMPLE = (
+    f'{FOLLOW_TABLE}.id IN (SELECT id FROM ('
+    f'SELECT id, ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY id DESC) '
+    f'AS position FROM {FOLLOW_TABLE}{{where}}'
+    f') ranked WHERE position <= %s)'
+)
+SIMILAR_AUTHORS = 20
+SHOWN = 5
+
+
+def chunks(ids, size=500):
+    ids = iter(ids)
+    while True:
+        chunk = list(islice(ids, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Graph:
+    """Граф подписок и групп.
+
+    Без user_ids граф читается целиком. С user_ids — только то, что нужно
+    для их рекомендаций: их подписки, подписки их авторов, выборка
+    подписчиков этих авторов с их подписками и группы. Число подписчиков
+    кандидатов берётся из UserCounters.
+    """
+
+    def __init__(self, user_ids=None):
+        self.following = defaultdict(set)
+        self.followers = defaultdict(set)
+        self.groups = defaultdict(set)
+        self.members = defaultdict(set)
+        self.samples = defaultdict(list)
+        self.similar_authors = {}
+        if user_ids is None:
+            self.add_follows(Follow.objects.all())
+            self.add_samples()
+            self.add_groups(Post.objects.all())
+            self.follower_counts = {
+                author_id: len(followers)
+                for author_id, followers in self.followers.items()
+            }
+            return
+        follows = Follow.objects.filter(user_id__in=user_ids)
+        self.add_follows(follows)
+        authors = follows.values('author_id')
+        self.add_follows(Follow.objects.filter(user_id__in=authors))
+        author_ids = set().union(*(self.following[pk] for pk in user_ids))
+        for chunk in chunks(author_ids):
+            self.add_samples(
+                f' WHERE author_id IN ({", ".join(["%s"] * len(chunk))})',
+                chunk
+            )
+        sampled = set().union(*map(self.sample, author_ids))
+        for chunk in chunks(sampled - author_ids - set(user_ids)):
+            self.add_follows(Follow.objects.filter(user_id__in=chunk))
+        self.follower_counts = {}
+        for chunk in chunks(set().union(
+            *(self.following[pk] for pk in sampled)
+        )):
+            self.follower_counts.update(
+                UserCounters.objects.filter(user_id__in=chunk).values_list(
+                    'user_id',
+                    'followers_count'
+                )
+            )
+        self.add_groups(Post.objects.filter(
+            group_id__in=Post.objects.filter(
+                author_id__in=user_ids
+            ).values('group_id')
+        ))
+
+    def add_follows(self, follows):
+        for user_id, author_id in follows.values_list(
+            'user_id',
+            'author_id'
+        ).iterator():
+            self.following[user_id].add(author_id)
+            self.followers[author_id].add(user_id)
+
+    def add_groups(self, posts):
+        for author_id, group_id in posts.filter(
+            group__isnull=False
+        ).order_by().values_list('author_id', 'group_id').distinct():
+            self.groups[author_id].add(group_id)
+            self.members[group_id].add(author_id)
+
+    def add_samples(self, where='', params=()):
+        for author_id, user_id in Follow.objects.extra(
+            where=[FOLLOWER_SAMPLE.format(where=where)],
+            params=[*params, CO_FOLLOW_SAMPLE]
+        ).values_list('author_id', 'user_id').iterator():
+            self.samples[author_id].append(user_id)
+
+    def sample(self, author_id):
+        return self.samples.get(author_id, [])
+
+    def similar(self, author_id):
+        """Авторы, которых читают вместе с author_id, и их близость."""
+        if author_id not in self.similar_authors:
+            sample = self.sample(author_id)
+            shared = Counter()
+            for user_id in sample:
+                shared.update(self.following[user_id])
+            shared.pop(author_id, None)
+            # Счётчик мог отстать от подписок, но не меньше общих.
+            self.similar_authors[author_id] = heapq.nlargest(
+                SIMILAR_AUTHORS,
+                ((other, count / math.sqrt(len(sample) * max(
+                    count,
+                    self.follower_counts.get(other, 0)
+                ))) for other, count in shared.items()),
+                key=itemgetter(1)
+            )
+        return self.similar_authors[author_id]
+
+    def scores(self, user_id):
+        friends = Counter()
+        for author_id in self.following[user_id]:
+            friends.update(self.following[author_id])
+        scores = Counter({
+            candidate: FRIENDS_WEIGHT * count
+            for candidate, count in friends.items()
+        })
+        for author_id in self.following[user_id]:
+            for candidate, similarity in self.similar(author_id):
+                scores[candidate] += CO_FOLLOW_WEIGHT * similarity
+        for group_id in self.groups[user_id]:
+            members = self.members[group_id]
+            for candidate in members:
+                scores[candidate] += GROUP_WEIGHT / len(members)
+        for excluded in (user_id, *self.following[user_id]):
+            scores.pop(excluded, None)
+        return scores.most_common(settings.SUGGESTIONS_PER_USER)
+
+
+def mark_stale(user_id, followed_ids=()):
+    """Ставит рекомендации user_id в очередь на пересчёт.
+
+    Авторы из followed_ids сразу пропадают из его рекомендаций. Версия
+    отметки растёт при каждой пометке, и refresh снимает только ту
+    версию, которую видел до чтения графа.
+    """
+    if followed_ids:
+        FollowSuggestion.objects.filter(
+            user_id=user_id,
+            candidate_id__in=followed_ids
+        ).delete()
+    if StaleSuggestions.objects.filter(user_id=user_id).update(
+        version=F('version') + 1
+    ):
+        return
+    StaleSuggestions.objects.bulk_create(
+        [StaleSuggestions(user_id=user_id)],
+        ignore_conflicts=True
+    )
+
+
+def unmark(user_ids, marks):
+    versions = defaultdict(list)
+    for user_id in user_ids:
+        if user_id in marks:
+            versions[marks[user_id]].append(user_id)
+    for version, stale_ids in versions.items():
+        StaleSuggestions.objects.filter(
+            user_id__in=stale_ids,
+            version=version
+        ).delete()
+
+
+def refresh(full=False, batch_size=1000):
+    """Пересчитывает рекомендации, возвращает число пользователей.
+
+    Отметки пачки снимаются в одной транзакции с записью её рекомендаций:
+    если расчёт прервётся, неготовые пользователи останутся помеченными.
+    """
+    marks = dict(StaleSuggestions.objects.values_list('user_id', 'version'))
+    if full:
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        graph = Graph()
+    else:
+        user_ids = list(marks)
+    refreshed = 0
+    for chunk in chunks(sorted(user_ids), batch_size):
+        if not full:
+            graph = Graph(chunk)
+        rows = [
+            FollowSuggestion(user_id=user_id, candidate_id=candidate,
+                             score=score)
+            for user_id in chunk
+            for candidate, score in graph.scores(user_id)
+        ]
+        with transaction.atomic():
+            unmark(chunk, marks)
+            FollowSuggestion.objects.filter(user_id__in=chunk).delete()
+            FollowSuggestion.objects.bulk_create(rows)
+        refreshed += len(chunk)
+    return refreshed
+
+
+def for_user(user, limit=SHOWN):
+    if user.is_anonymous:
+        return []
+    return [
+        suggestion.candidate
+        for suggestion in FollowSuggestion.objects.filter(
+            user=user
+        ).select_related('candidate').order_by('-score')[:limit]
+    ]
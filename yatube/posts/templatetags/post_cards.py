@@ -0,0 +1,41 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from posts import cache_keys
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/article.html'
+
+
+def load_cards(posts, show_url):
+    """Достаёт карточки страницы одним get_many, недостающие рисует."""
+    keys = {cache_keys.post_card(post, show_url): post for post in posts}
+    cards = cache.get_many(keys)
+    missing = {}
+    card_template = get_template(CARD_TEMPLATE)
+    for key, post in keys.items():
+        if key not in cards:
+            missing[key] = card_template.render(
+                {'post': post, 'show_url': show_url}
+            )
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    cards.update(missing)
+    return {post.pk: cards[key] for key, post in keys.items()}
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, show_url=False):
+    cache_name = ('post_cards', show_url)
+    cards = context.render_context.get(cache_name)
+    if cards is None or post.pk not in cards:
+        page = context.get('page_obj') or [post]
+        if post not in page:
+            page = [post]
+        cards = load_cards(page, show_url)
+        context.render_context[cache_name] = cards
+    return mark_safe(cards[post.pk])
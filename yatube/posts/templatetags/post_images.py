@@ -0,0 +1,24 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+def srcset(candidates):
+    return ', '.join(f'{url} {width}w' for width, url in candidates)
+
+
+@register.inclusion_tag('includes/responsive_image.html')
+def responsive_image(image, alt=''):
+    sources = thumbnails.card_sources(image) if image else None
+    context = {'image': image, 'sources': sources, 'alt': alt}
+    if sources:
+        context.update({
+            'src': sources['JPEG'][-1][1],
+            'webp_srcset': srcset(sources['WEBP']),
+            'jpeg_srcset': srcset(sources['JPEG']),
+            'sizes': thumbnails.CARD_SIZES,
+            'mime_types': thumbnails.FORMATS,
+        })
+    return context
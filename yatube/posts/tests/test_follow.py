@@ -1,16 +1,23 @@
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.cache import cache
+from django.core.management import call_command
 from django.test import Client, TestCase
 from django.test import override_settings
 from django.urls import reverse
 
-from posts.models import Follow, Post
+from posts import timeline
+from posts.models import Follow, Post, TimelineBackfill, TimelineEntry
 
 User = get_user_model()
+FOLLOWERS_PER_PAGE = 50
+NUMBER_OF_POSTS = 10
+FEED_POSTS = 15
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
@@ -91,3 +98,187 @@ class TestFollowing(TestCase):
             self.one_post,
             response_unfollower.context['page_obj']
         )
+
+    def test_new_post_fans_out_to_timeline(self):
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower,
+                post=new_post
+            ).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_read_without_fan_out(self):
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_cursor_pages_merge_timeline_and_celebrities(self):
+        celebrity = User.objects.create_user(username='celebrity')
+        fan = User.objects.create_user(username='fan')
+        for reader in (self.follower, fan):
+            Follow.objects.create(user=reader, author=celebrity)
+        posts = [self.one_post]
+        for i in range(FEED_POSTS - 1):
+            posts.append(Post.objects.create(
+                author=(self.author, celebrity)[i % 2],
+                text=f'Пост {i}'
+            ))
+        url = reverse('posts:follow_index')
+        response = self.authorized_client.get(url)
+        shown = list(response.context['page_obj'])
+        cursor = response.context['page_obj'].next_cursor
+        response = self.authorized_client.get(url, {'cursor': cursor})
+        shown += list(response.context['page_obj'])
+        self.assertEqual(shown, posts[::-1])
+        self.assertIsNone(response.context['page_obj'].next_cursor)
+        response = self.authorized_client.get(
+            url,
+            {'cursor': response.context['page_obj'].previous_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            shown[:NUMBER_OF_POSTS]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_former_celebrity_posts_stay_in_feed(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists()
+        )
+        Follow.objects.filter(user=reader).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'])
+        call_command('rebuild_timelines', '--pending', stdout=StringIO())
+        self.assertFalse(TimelineBackfill.objects.exists())
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower,
+                post=new_post
+            ).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']).count(new_post),
+            1
+        )
+
+    @override_settings(TIMELINE_BATCH_SIZE=2)
+    def test_fan_out_posts_inserts_in_chunks(self):
+        readers = [
+            User.objects.create_user(username=f'reader{i}') for i in range(2)
+        ]
+        Follow.objects.bulk_create(
+            [Follow(user=reader, author=self.author) for reader in readers]
+        )
+        Post.objects.create(author=self.author, text='Новый пост')
+        TimelineEntry.objects.all().delete()
+        with mock.patch.object(
+            TimelineEntry.objects,
+            'bulk_create',
+            wraps=TimelineEntry.objects.bulk_create
+        ) as bulk_create:
+            timeline.fan_out_posts(
+                Post.objects.filter(author=self.author)
+            )
+        self.assertEqual(
+            [len(call[0][0]) for call in bulk_create.call_args_list],
+            [2, 2, 2]
+        )
+        self.assertEqual(TimelineEntry.objects.count(), 6)
+
+    def test_rebuild_timelines_restores_feed(self):
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(self.one_post, response.context['page_obj'])
+
+    def test_follow_is_idempotent(self):
+        url = reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        )
+        for _ in range(2):
+            self.assertRedirects(
+                self.authorized_client.get(url),
+                reverse('posts:profile', args=(self.author.username,))
+            )
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.follower.username}
+        ))
+        self.assertEqual(self.follower.follower.count(), 1)
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.followers_count, 1)
+        for _ in range(2):
+            self.authorized_client.get(reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.author.username}
+            ))
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.followers_count, 0)
+
+    def test_follow_many_authors_in_one_request(self):
+        authors = [
+            User.objects.create_user(username=f'bulk_{i}') for i in range(3)
+        ]
+        post = Post.objects.create(author=authors[0], text='Пост')
+        usernames = [author.username for author in authors]
+        response = self.authorized_client.post(
+            reverse('posts:follow_many'),
+            {'username': [*usernames, 'author', 'follower', 'nobody']}
+        )
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(self.follower.follower.count(), 1 + len(authors))
+        self.follower.counters.refresh_from_db()
+        self.assertEqual(
+            self.follower.counters.following_count,
+            1 + len(authors)
+        )
+        authors[0].counters.refresh_from_db()
+        self.assertEqual(authors[0].counters.followers_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower,
+                post=post
+            ).exists()
+        )
+        self.assertEqual(
+            self.authorized_client.get(reverse('posts:follow_many'))
+            .status_code,
+            405
+        )
+
+    def test_follower_lists_are_paginated(self):
+        Follow.objects.bulk_create(
+            Follow(
+                user=User.objects.create_user(username=f'reader_{i}'),
+                author=self.author
+            )
+            for i in range(FOLLOWERS_PER_PAGE)
+        )
+        url = reverse('posts:followers', args=(self.author.username,))
+        with self.assertNumQueries(4):
+            response = self.authorized_client.get(url)
+        first_page = response.context['people']
+        self.assertEqual(len(first_page), FOLLOWERS_PER_PAGE)
+        response = self.authorized_client.get(
+            url,
+            {'cursor': response.context['page_obj'].next_cursor}
+        )
+        self.assertEqual(response.context['people'], [self.follower])
+        response = self.authorized_client.get(
+            reverse('posts:following', args=(self.follower.username,))
+        )
+        self.assertEqual(response.context['people'], [self.author])
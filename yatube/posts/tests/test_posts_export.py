@@ -0,0 +1,161 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+POSTS_COUNT = 5
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост «{i}», ok')
+            for i in range(POSTS_COUNT)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0],
+            author=cls.reader,
+            text='Комментарий'
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def export(self, *args):
+        call_command(
+            'export_data', self.directory, '--chunk-size', '2', *args,
+            stdout=StringIO()
+        )
+
+    def read(self, name, opener=open):
+        with opener(os.path.join(self.directory, name), 'rt',
+                    encoding='utf-8', newline='') as stream:
+            return stream.read()
+
+    def test_export_jsonl_and_csv(self):
+        self.export()
+        rows = [
+            json.loads(line)
+            for line in self.read('posts.jsonl').splitlines()
+        ]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [post.pk for post in self.posts]
+        )
+        self.assertEqual(rows[0]['text'], self.posts[0].text)
+        self.assertEqual(len(self.read('comments.jsonl').splitlines()), 1)
+        self.assertEqual(len(self.read('follows.jsonl').splitlines()), 1)
+        self.export('--format', 'csv', '--tables', 'posts')
+        rows = list(csv.DictReader(StringIO(self.read('posts.csv'))))
+        self.assertEqual(len(rows), POSTS_COUNT)
+        self.assertEqual(rows[-1]['text'], self.posts[-1].text)
+
+    def test_export_columnar_chunks(self):
+        self.export('--format', 'columnar', '--tables', 'follows')
+        chunk = json.loads(self.read('follows.columns.jsonl'))
+        self.assertEqual(chunk['user_id'], [self.reader.pk])
+        self.assertEqual(chunk['author_id'], [self.author.pk])
+
+    def test_gzip_export_resumes_from_checkpoint(self):
+        self.export('--gzip', '--tables', 'posts')
+        checkpoint = json.loads(self.read('checkpoint.json'))
+        self.assertEqual(checkpoint, {'posts': self.posts[-1].pk})
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.export('--gzip', '--tables', 'posts', '--resume')
+        lines = self.read('posts.jsonl.gz', gzip.open).splitlines()
+        self.assertEqual(len(lines), POSTS_COUNT + 1)
+        self.assertEqual(json.loads(lines[-1])['text'], 'Новый пост')
+
+    def test_admin_action_streams_selected_rows(self):
+        admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.post(
+            reverse('admin:posts_post_changelist'),
+            {'action': 'export_csv',
+             '_selected_action': [post.pk for post in self.posts[:2]]}
+        )
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="posts.csv"'
+        )
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(
+            [int(row['id']) for row in rows],
+            [post.pk for post in self.posts[:2]]
+        )
+
+    def test_admin_exports_comments(self):
+        admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.post(
+            reverse('admin:posts_comment_changelist'),
+            {'action': 'export_jsonl',
+             '_selected_action': Comment.objects.values_list('pk', flat=True)}
+        )
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(rows[0])['text'], 'Комментарий')
+
+    def test_user_downloads_own_data(self):
+        client = Client()
+        url = reverse('posts:export_own_data', args=('posts',))
+        self.assertRedirects(
+            client.get(url),
+            f'{reverse("users:login")}?next={url}'
+        )
+        client.force_login(self.author)
+        response = client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        posts = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(
+            [post['id'] for post in posts],
+            [post.pk for post in self.posts]
+        )
+        response = client.get(
+            reverse('posts:export_own_data', args=('comments',)),
+            {'format': 'csv'}
+        )
+        self.assertEqual(
+            list(csv.reader(StringIO(
+                b''.join(response.streaming_content).decode()
+            ))),
+            [['id', 'post_id', 'author_id', 'text', 'created']]
+        )
+        client.force_login(self.reader)
+        response = client.get(
+            reverse('posts:export_own_data', args=('comments',))
+        )
+        comments = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(comments[0]['text'], 'Комментарий')
+        response = client.get(
+            reverse('posts:export_own_data', args=('follows',))
+        )
+        self.assertEqual(response.status_code, 404)
@@ -1,18 +1,38 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, override_settings, TestCase
 from django.urls import reverse
+from PIL import Image
 
+from posts import thumbnails
+from posts.forms import PostForm
 from posts.models import Comment, Group, Post
 
 User = get_user_model()
 
 FIRST_POST_ID = 1
+PLACEHOLDER = 'Изображение обрабатывается'
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+EXIF_ORIENTATION = 0x0112
+
+
+def make_upload(name, size, mode='RGB', image_format='JPEG', exif=None):
+    output = BytesIO()
+    Image.new(mode, size).save(output, image_format, exif=exif or b'')
+    return SimpleUploadedFile(name, output.getvalue(), 'image/jpeg')
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -133,6 +153,26 @@ class PostCreateFormTests(TestCase):
             comments_count + 1
         )
 
+    def test_reply_joins_thread_of_same_post(self):
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        other_post = Post.objects.create(author=self.user, text='Другой')
+        root = Comment.objects.create(
+            post=post,
+            author=self.user,
+            text='Начало ветки'
+        )
+        for target, data in ((post, {'parent': root.pk}),
+                             (other_post, {'parent': root.pk})):
+            self.authorized_client.post(
+                reverse('posts:add_comment', kwargs={'post_id': target.pk}),
+                data={'text': 'Ответ', **data}
+            )
+        self.assertIsNone(Comment.objects.get(post=other_post).parent)
+        reply = Comment.objects.get(post=post, text='Ответ')
+        self.assertEqual((reply.parent, reply.root), (root, root))
+        self.assertEqual(reply.path, f'{root.pk:010d}{reply.pk:010d}')
+        self.assertEqual(reply.depth, 1)
+
     def test_image_saved(self):
         self.small_gif = (
             b'\x47\x49\x46\x38\x39\x61\x02\x00'
@@ -162,4 +202,94 @@ class PostCreateFormTests(TestCase):
                 kwargs={'post_id': FIRST_POST_ID}
             )
         )
-        self.assertEqual(response.context.get('post').image, 'posts/small.gif')
+        self.assertRegex(
+            response.context.get('post').image.name,
+            r'^posts/\w{2}/\w{64}\.jpg$'
+        )
+
+    def test_placeholder_shown_until_thumbnail_ready(self):
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('ready.gif', SMALL_GIF, 'image/gif')
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        self.assertContains(self.guest_client.get(url), PLACEHOLDER)
+        thumbnails.generate_thumbnails(post.id)
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, '<img class="card-img my-2"')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        sources = thumbnails.card_sources(post.image)
+        self.assertEqual(
+            [width for width, url in sources['JPEG']],
+            [2],
+            'Маленький оригинал не должен растягиваться'
+        )
+
+    @override_settings(THUMBNAIL_QUEUE='inline')
+    def test_post_create_queues_thumbnails(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'queued.gif',
+                    SMALL_GIF,
+                    'image/gif'
+                ),
+            }
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertIsNotNone(thumbnails.card_sources(post.image))
+
+    def post_form(self, upload):
+        return PostForm(data={'text': 'Текст'}, files={'image': upload})
+
+    def test_image_is_oriented_downscaled_and_stripped(self):
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        form = self.post_form(make_upload('photo.jpeg', (400, 100), exif=exif))
+        with self.settings(IMAGE_MAX_SIDE=200):
+            self.assertTrue(form.is_valid(), form.errors)
+        image = Image.open(form.cleaned_data['image'])
+        self.assertEqual(form.cleaned_data['image'].name, 'photo.jpg')
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (50, 200))
+        self.assertNotIn('exif', image.info)
+
+    def test_transparent_image_is_saved_as_webp(self):
+        form = self.post_form(
+            make_upload('logo.png', (10, 10), 'RGBA', 'PNG')
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['image'].name, 'logo.webp')
+        self.assertEqual(Image.open(form.cleaned_data['image']).mode, 'RGBA')
+
+    def test_oversized_images_are_rejected(self):
+        limits = {
+            'IMAGE_MAX_UPLOAD_SIZE': 10,
+            'IMAGE_MAX_PIXELS': 100,
+        }
+        for setting, limit in limits.items():
+            with self.subTest(setting=setting), self.settings(
+                **{setting: limit}
+            ):
+                form = self.post_form(make_upload('big.jpg', (20, 20)))
+                self.assertFalse(form.is_valid())
+                self.assertIn('image', form.errors)
+
+    def test_broken_image_is_rejected(self):
+        output = BytesIO()
+        Image.effect_noise((200, 200), 50).save(output, 'JPEG')
+        form = self.post_form(SimpleUploadedFile(
+            'broken.jpg',
+            output.getvalue()[:output.tell() // 2],
+            'image/jpeg'
+        ))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors['image'],
+            ['Не удалось прочитать картинку.']
+        )
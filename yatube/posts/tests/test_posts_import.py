@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts import search
+from posts.models import Follow, Group, ImageBlob, Post
+from posts.timeline import follow_feed
+from .test_posts_forms import SMALL_GIF
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def write_input(self, name, content):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return path
+
+    def test_import_jsonl_updates_derived_data(self):
+        rows = [
+            {'text': f'Импортированный пост про барсука {i}',
+             'author': 'author', 'group': 'test_slug',
+             'pub_date': f'2020-01-0{i + 1}T10:00:00'}
+            for i in range(5)
+        ]
+        rows.append({'text': 'Чужой пост', 'author': 'nobody'})
+        path = self.write_input(
+            'posts.jsonl',
+            '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows)
+            + '\nне json\n'
+        )
+        stderr = StringIO()
+        call_command(
+            'import_posts', path, '--batch-size', '2',
+            stdout=StringIO(), stderr=stderr
+        )
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(stderr.getvalue().count('Строка'), 2)
+        self.assertEqual(
+            Post.objects.order_by('pub_date').first().pub_date.year,
+            2020
+        )
+        self.author.counters.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 5)
+        self.assertEqual(self.group.posts_count, 5)
+        self.assertEqual(follow_feed(self.reader).count(), 5)
+        self.assertEqual(
+            len(search.search_posts(Post.objects.all(), 'барсуки')),
+            5
+        )
+
+    def test_import_csv_with_images(self):
+        images = os.path.join(TEMP_MEDIA_ROOT, 'images')
+        os.makedirs(images)
+        with open(os.path.join(images, 'small.gif'), 'wb') as image:
+            image.write(SMALL_GIF)
+        path = self.write_input(
+            'posts.csv',
+            'text,author,image\n'
+            'Первый,author,small.gif\n'
+            'Второй,author,small.gif\n'
+            'Третий,author,missing.gif\n'
+        )
+        call_command(
+            'import_posts', path, '--images', images,
+            stdout=StringIO(), stderr=StringIO()
+        )
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(
+            ImageBlob.objects.get(name=names.pop()).references,
+            2
+        )
@@ -1,11 +1,24 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import get_thumbnail
 
-from ..models import Group, Post
+from .. import thumbnails
+from ..models import Comment, Follow, Group, ImageBlob, Post, UserCounters
+from .test_posts_forms import SMALL_GIF
 
 User = get_user_model()
 
 CUT_OFF = 15
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 class PostModelTest(TestCase):
@@ -37,3 +50,189 @@ class PostModelTest(TestCase):
         for val, expected in values:
             with self.subTest(val=val):
                 self.assertEqual(val, expected)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self, user, **expected):
+        counters = UserCounters.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(counters, field), value)
+
+    def test_counters_follow_changes(self):
+        """Проверяем, что счётчики обновляются вместе с данными."""
+        post = Post.objects.create(
+            author=self.author,
+            text='Тестовый пост',
+            group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounters(self.author, posts_count=1, followers_count=1)
+        self.assertCounters(self.reader, following_count=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        Follow.objects.all().delete()
+        self.assertCounters(self.author, posts_count=0, followers_count=0)
+        self.assertCounters(self.reader, following_count=0)
+
+    def test_recount_repairs_drift(self):
+        """Проверяем, что recount исправляет счётчики после bulk_create."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Тестовый пост', group=self.group)
+            for _ in range(3)
+        )
+        UserCounters.objects.filter(user=self.reader).delete()
+        call_command('recount', stdout=StringIO())
+        self.assertCounters(self.author, posts_count=3)
+        self.assertCounters(self.reader, posts_count=0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+
+
+class CommentPathsTest(TestCase):
+    def test_fill_comment_paths_after_bulk_create(self):
+        """Проверяем, что команда достраивает ветки из bulk_create."""
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Тестовый пост')
+        root = Comment.objects.create(post=post, author=user, text='Начало')
+        Comment.objects.bulk_create([
+            Comment(post=post, author=user, text='Ответ', parent=root),
+            Comment(post=post, author=user, text='Новая ветка'),
+        ])
+        reply, other = Comment.objects.filter(path='').order_by('pk')
+        Comment.objects.bulk_create([
+            Comment(post=post, author=user, text='Ответ на ответ',
+                    parent=reply),
+        ])
+        stdout = StringIO()
+        call_command('fill_comment_paths', stdout=stdout)
+        self.assertIn('Исправлено комментариев: 3', stdout.getvalue())
+        nested = Comment.objects.get(parent=reply)
+        reply.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(
+            [(comment.root_id, comment.depth)
+             for comment in (reply, nested, other)],
+            [(root.pk, 1), (root.pk, 2), (None, 0)]
+        )
+        self.assertTrue(nested.path.startswith(reply.path))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch('posts.blobs.transaction.on_commit', lambda callback: callback())
+class ImageBlobTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif')
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^posts/\w{2}/\w{64}\.gif$')
+        self.assertEqual(ImageBlob.objects.get().references, 2)
+        thumbnails.generate_thumbnails(first.pk)
+        self.assertIsNotNone(thumbnails.card_sources(second.image))
+
+    def test_file_is_deleted_with_last_reference(self):
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        thumbnails.generate_thumbnails(first.pk)
+        card = thumbnails.ready_thumbnail(first.image, 'card-320-jpeg')
+        storage = first.image.storage
+        first.delete()
+        self.assertTrue(storage.exists(second.image.name))
+        second.delete()
+        self.assertFalse(storage.exists(second.image.name))
+        self.assertFalse(card.exists())
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_no_temporary_files_are_left(self):
+        first = self.create_post('first.gif')
+        self.create_post('second.gif')
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(first.image.name)]
+        )
+
+    def test_reupload_before_commit_keeps_file(self):
+        first = self.create_post('first.gif')
+        callbacks = []
+        with mock.patch('posts.blobs.transaction.on_commit', callbacks.append):
+            first.delete()
+        second = self.create_post('second.gif')
+        for callback in callbacks:
+            callback()
+        self.assertTrue(second.image.storage.exists(second.image.name))
+        self.assertEqual(ImageBlob.objects.get().references, 1)
+
+    def test_replaced_image_is_released(self):
+        post = self.create_post('first.gif')
+        old_name = post.image.name
+        post.image = SimpleUploadedFile('other.gif', SMALL_GIF + b'\0')
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post.image.storage.exists(old_name))
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', flat=True)),
+            [post.image.name]
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ReadyThumbnailTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_ready_names_match_sorl(self):
+        """ReadyThumbnailBackend повторяет закрытые методы sorl
+        (версия закреплена в requirements.txt): имена должны совпадать
+        с теми, что даёт get_thumbnail."""
+        post = Post.objects.create(
+            author=User.objects.create_user(username='auth'),
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('photo.gif', SMALL_GIF, 'image/gif')
+        )
+        for size, (geometry, options) in thumbnails.THUMBNAILS.items():
+            with self.subTest(size=size):
+                self.assertEqual(
+                    thumbnails.thumbnail_file(post.image, size).name,
+                    get_thumbnail(post.image, geometry, **options).name
+                )
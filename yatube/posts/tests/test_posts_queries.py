@@ -0,0 +1,209 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import threads, thumbnails
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.test_posts_forms import SMALL_GIF
+
+User = get_user_model()
+
+NUMBER_OF_POSTS = 15
+NUMBER_OF_COMMENTS = 5
+COMMENTS_PER_PAGE = 20
+NUMBER_OF_IMAGES = 3
+INDEX_QUERIES = 3
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        for i in range(NUMBER_OF_POSTS):
+            author = User.objects.create_user(username=f'author_{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(
+                author=author,
+                text='Тестовый пост',
+                group=cls.group
+            )
+        cls.post = Post.objects.create(
+            author=cls.reader,
+            text='Пост с комментариями',
+            group=cls.group
+        )
+        for i in range(NUMBER_OF_COMMENTS):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.get(username=f'author_{i}'),
+                text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_feed_views_query_budget(self):
+        budgets = {
+            reverse('posts:index'): INDEX_QUERIES,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 4,
+            reverse('posts:profile', kwargs={'username': 'author_0'}): 6,
+            # Строки ленты по индексу, затем посты страницы по id.
+            reverse('posts:follow_index'): 6,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}): 5,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    self.client.get(url)
+
+    def test_comments_are_paginated_with_fixed_budget(self):
+        Comment.objects.bulk_create(
+            Comment(
+                post=self.post,
+                author=User.objects.get(
+                    username=f'author_{i % NUMBER_OF_POSTS}'
+                ),
+                text=f'Ещё комментарий {i}'
+            )
+            for i in range(COMMENTS_PER_PAGE)
+        )
+        total = NUMBER_OF_COMMENTS + COMMENTS_PER_PAGE
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+            )
+        first_page = response.context['comments']
+        self.assertEqual(len(first_page), COMMENTS_PER_PAGE)
+        fragment_url = reverse(
+            'posts:post_comments',
+            kwargs={'post_id': self.post.pk}
+        )
+        self.assertContains(
+            response,
+            f'{fragment_url}?cursor={first_page.next_cursor}'
+        )
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                fragment_url,
+                {'cursor': first_page.next_cursor}
+            )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertNotContains(response, 'js-more-comments')
+        data = self.client.get(
+            fragment_url,
+            {'cursor': first_page.next_cursor, 'format': 'json'}
+        ).json()
+        self.assertIsNone(data['next_cursor'])
+        seen = {comment.pk for comment in first_page}
+        seen.update(comment['id'] for comment in data['comments'])
+        self.assertEqual(len(seen), total)
+
+    def test_threads_are_loaded_in_one_query(self):
+        root = Comment.objects.filter(post=self.post).first()
+        parent = root
+        for i in range(threads.MAX_DEPTH + 2):
+            parent = Comment.objects.create(
+                post=self.post,
+                author=self.reader,
+                text=f'Ответ {i}',
+                parent=parent
+            )
+        for i in range(threads.REPLIES_PER_THREAD):
+            Comment.objects.create(
+                post=self.post,
+                author=self.reader,
+                text=f'Ещё ответ {i}',
+                parent=root
+            )
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+            )
+        thread = next(
+            comment for comment in response.context['comments']
+            if comment.pk == root.pk
+        )
+        self.assertEqual(
+            len(thread.thread_replies),
+            threads.REPLIES_PER_THREAD
+        )
+        self.assertTrue(thread.more_replies)
+        self.assertEqual(
+            [reply.depth for reply in thread.thread_replies[:7]],
+            [1, 2, 3, 4, 5, 5, 5]
+        )
+        replies_url = reverse(
+            'posts:comment_replies',
+            kwargs={'post_id': self.post.pk, 'comment_id': root.pk}
+        )
+        with self.assertNumQueries(2):
+            data = self.client.get(replies_url, {
+                'after': thread.thread_replies[-1].path,
+                'format': 'json'
+            }).json()
+        self.assertFalse(data['more_replies'])
+        self.assertEqual(
+            len(thread.thread_replies) + len(data['replies']),
+            threads.MAX_DEPTH + 2 + threads.REPLIES_PER_THREAD
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        for i in range(NUMBER_OF_IMAGES):
+            post = Post.objects.create(
+                author=cls.user,
+                text='Пост с картинкой',
+                image=SimpleUploadedFile(
+                    'image.gif',
+                    SMALL_GIF + bytes([i]),
+                    'image/gif'
+                )
+            )
+            thumbnails.generate_thumbnails(post.pk)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_page_thumbnails_are_loaded_in_one_batch(self):
+        with self.assertNumQueries(INDEX_QUERIES + 1):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            'type="image/webp"',
+            count=NUMBER_OF_IMAGES
+        )
+        # Новая отметка updated сбрасывает карточки, но не миниатюры.
+        Post.objects.update(updated=timezone.now())
+        with self.assertNumQueries(INDEX_QUERIES):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            'type="image/webp"',
+            count=NUMBER_OF_IMAGES
+        )
@@ -0,0 +1,158 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post, SearchIndexChange
+from posts.stemmer import stem
+
+User = get_user_model()
+
+SEARCH_PER_PAGE = 10
+# TestCase не коммитит транзакцию, а inline-индексация ждёт коммита.
+INDEX_NOW = mock.patch(
+    'posts.search.transaction.on_commit',
+    lambda callback: callback()
+)
+
+
+@INDEX_NOW
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        with INDEX_NOW:
+            cls.cat_post = Post.objects.create(
+                author=cls.user,
+                text='Мой кот любит спать на подоконнике'
+            )
+            cls.cats_post = Post.objects.create(
+                author=cls.user,
+                text='Коты, коты и ещё раз котами полон дом'
+            )
+            cls.dog_post = Post.objects.create(
+                author=cls.user,
+                text='Собака гуляет во дворе'
+            )
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': query, **params}
+        )
+        return response, list(response.context['page_obj'])
+
+    def test_stemmer_reduces_word_forms(self):
+        for words in (('кот', 'котами', 'коты'),
+                      ('известные', 'известный', 'известного'),
+                      ('гуляет', 'гулять', 'гуляли')):
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+    def test_search_matches_word_forms_and_ranks(self):
+        response, posts = self.search('Котов')
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(posts, [self.cats_post, self.cat_post])
+
+    def test_search_requires_all_terms(self):
+        _, posts = self.search('кот подоконник')
+        self.assertEqual(posts, [self.cat_post])
+        _, posts = self.search('')
+        self.assertEqual(posts, [])
+
+    def test_index_follows_edit_and_delete(self):
+        self.dog_post.text = 'Теперь здесь про кошку'
+        self.dog_post.save()
+        _, posts = self.search('собака')
+        self.assertEqual(posts, [])
+        _, posts = self.search('кошки')
+        self.assertEqual(posts, [self.dog_post])
+        self.dog_post.delete()
+        _, posts = self.search('кошки')
+        self.assertEqual(posts, [])
+
+    def test_inline_indexer_leaves_change_log_alone(self):
+        SearchIndexChange.objects.create(post_id=self.cat_post.pk)
+        post = Post.objects.create(author=self.user, text='Про жирафа')
+        _, found = self.search('жирафы')
+        self.assertEqual(found, [post])
+        self.assertEqual(
+            list(SearchIndexChange.objects.values_list('post_id', flat=True)),
+            [self.cat_post.pk]
+        )
+
+    def test_search_pages_with_cursor(self):
+        for i in range(SEARCH_PER_PAGE + 2):
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост про котика номер {i}'
+            )
+        response, first_page = self.search('котик')
+        self.assertEqual(len(first_page), SEARCH_PER_PAGE)
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA&amp;')
+        _, second_page = self.search('котик', cursor=next_cursor)
+        seen = {post.pk for post in first_page + second_page}
+        self.assertEqual(len(seen), SEARCH_PER_PAGE + 2)
+
+    def test_admin_uses_search_index(self):
+        admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'),
+            {'q': 'котами'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.cat_post, self.cats_post}
+        )
+
+    @override_settings(SEARCH_INDEXER='background')
+    def test_background_indexer_processes_change_log_in_batches(self):
+        posts = [
+            Post.objects.create(author=self.user, text=f'Про слона {i}')
+            for i in range(3)
+        ]
+        self.assertEqual(SearchIndexChange.objects.count(), len(posts))
+        _, found = self.search('слоны')
+        self.assertEqual(found, [])
+        self.assertEqual(search.process_changes(batch_size=2), len(posts))
+        self.assertFalse(SearchIndexChange.objects.exists())
+        _, found = self.search('слоны')
+        self.assertEqual(set(found), set(posts))
+        posts[0].delete()
+        call_command('search_indexer', '--once', stdout=StringIO())
+        _, found = self.search('слоны')
+        self.assertEqual(set(found), set(posts[1:]))
+
+    def test_reindex_command_repairs_index(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Массовый импорт про ежа {i}')
+            for i in range(5)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM posts_post WHERE id = %s',
+                [self.dog_post.pk]
+            )
+        call_command('reindex_search', '--chunk-size', '2', stdout=StringIO())
+        _, found = self.search('ежи')
+        self.assertEqual(len(found), 5)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {search.FTS_TABLE} WHERE rowid = %s',
+                [self.dog_post.pk]
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
@@ -0,0 +1,121 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Follow, Group, Post, StaleSuggestions
+
+User = get_user_model()
+
+
+class SuggestionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        names = ('reader', 'alice', 'bob', 'carol', 'dave', 'erin')
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names
+        }
+        for user, author in (('reader', 'alice'), ('alice', 'bob'),
+                             ('carol', 'alice'), ('carol', 'dave')):
+            Follow.objects.create(
+                user=cls.users[user],
+                author=cls.users[author]
+            )
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        for name in ('reader', 'erin'):
+            Post.objects.create(
+                author=cls.users[name],
+                text='Пост в группе',
+                group=group
+            )
+
+    def setUp(self):
+        self.reader = self.users['reader']
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def suggested(self):
+        return [user.username for user in suggestions.for_user(self.reader)]
+
+    def test_scores_combine_graph_and_groups(self):
+        suggestions.refresh(full=True)
+        # dave читают вместе с alice, bob — друг друга, erin пишет
+        # в ту же группу.
+        self.assertEqual(self.suggested(), ['dave', 'bob', 'erin'])
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    def test_follow_marks_stale_and_refresh_is_incremental(self):
+        suggestions.refresh(full=True)
+        self.client.get(reverse('posts:profile_follow', args=('bob',)))
+        self.assertEqual(self.suggested(), ['dave', 'erin'])
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list('user', flat=True)),
+            [self.reader.pk]
+        )
+        stdout = StringIO()
+        call_command('refresh_suggestions', stdout=stdout)
+        self.assertIn('Пересчитано пользователей: 1', stdout.getvalue())
+        self.assertEqual(self.suggested(), ['dave', 'erin'])
+
+    def test_suggestions_are_served_with_bulk_follow_form(self):
+        suggestions.refresh(full=True)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [user.username for user in response.context['suggestions']],
+            ['dave', 'bob', 'erin']
+        )
+        self.assertContains(response, reverse('posts:follow_many'))
+        self.client.post(
+            reverse('posts:follow_many'),
+            {'username': ['dave', 'erin']}
+        )
+        self.assertEqual(self.suggested(), ['bob'])
+
+    def test_neighbourhood_graph_scores_like_full_graph(self):
+        full = suggestions.Graph()
+        for user in self.users.values():
+            self.assertEqual(
+                suggestions.Graph([user.pk]).scores(user.pk),
+                full.scores(user.pk)
+            )
+
+    def test_followers_are_sampled_in_database(self):
+        alice, carol = self.users['alice'], self.users['carol']
+        with mock.patch.object(suggestions, 'CO_FOLLOW_SAMPLE', 1):
+            graph = suggestions.Graph([self.reader.pk])
+            full = suggestions.Graph()
+        # Из двух подписчиков alice берётся последний.
+        self.assertEqual(graph.sample(alice.pk), [carol.pk])
+        self.assertEqual(full.sample(alice.pk), [carol.pk])
+        self.assertEqual(
+            graph.scores(self.reader.pk),
+            full.scores(self.reader.pk)
+        )
+
+    def test_mark_during_refresh_survives(self):
+        suggestions.mark_stale(self.reader.pk)
+        scores = suggestions.Graph.scores
+
+        def follow_while_scoring(graph, user_id):
+            suggestions.mark_stale(user_id)
+            return scores(graph, user_id)
+
+        with mock.patch.object(
+            suggestions.Graph,
+            'scores',
+            follow_while_scoring
+        ):
+            suggestions.refresh()
+        self.assertTrue(
+            StaleSuggestions.objects.filter(user=self.reader).exists()
+        )
+        suggestions.refresh()
+        self.assertFalse(StaleSuggestions.objects.exists())
@@ -0,0 +1,150 @@
+import math
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Follow, Group, Post, TrendingScore
+
+User = get_user_model()
+
+POST = TrendingScore.POST
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        cls.quiet_post = Post.objects.create(
+            author=cls.author,
+            text='Тихий пост'
+        )
+        cls.hot_post = Post.objects.create(
+            author=cls.author,
+            text='Обсуждаемый пост',
+            group=cls.group
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def score(self, kind, object_id):
+        return TrendingScore.objects.get(
+            kind=kind,
+            object_id=object_id
+        ).score
+
+    def test_scores_add_up_and_decay(self):
+        now = timezone.now()
+        half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        for _ in range(3):
+            trending.record(POST, 1, 1, now - 3 * half_life)
+        trending.record(POST, 2, 1, now)
+        self.assertAlmostEqual(
+            self.score(POST, 1),
+            trending.log_weight(3 / 8, now)
+        )
+        self.assertGreater(self.score(POST, 2), self.score(POST, 1))
+        trending.record(POST, 1, 2, now)
+        self.assertAlmostEqual(
+            self.score(POST, 1),
+            trending.log_weight(2 + 3 / 8, now)
+        )
+        self.assertAlmostEqual(
+            self.score(POST, 1) - self.score(POST, 2),
+            math.log(2 + 3 / 8)
+        )
+
+    def test_subtract_keeps_remaining_weight(self):
+        now = timezone.now()
+        trending.record(POST, 1, 3, now)
+        trending.subtract(POST, 1, trending.log_weight(1, now), now)
+        self.assertAlmostEqual(
+            self.score(POST, 1),
+            trending.log_weight(2, now)
+        )
+        trending.subtract(POST, 1, trending.log_weight(2, now), now)
+        self.assertFalse(TrendingScore.objects.filter(kind=POST).exists())
+
+    def test_events_feed_trending_page(self):
+        Comment.objects.create(
+            post=self.hot_post,
+            author=self.reader,
+            text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(reverse('posts:trending_index'))
+        self.assertEqual(list(response.context['page_obj']), [self.hot_post])
+        self.assertEqual(response.context['trending_groups'], [self.group])
+        self.assertEqual(response.context['trending_authors'], [self.author])
+        self.assertContains(response, self.group.title)
+
+    def test_compaction_drops_cold_and_deleted_objects(self):
+        now = timezone.now()
+        deleted_group = Group.objects.create(
+            title='Удалю',
+            slug='deleted_slug',
+            description='Тестовое описание'
+        )
+        trending.record(POST, self.quiet_post.pk, 1, now - timedelta(days=30))
+        group_pk = deleted_group.pk
+        trending.record(TrendingScore.GROUP, group_pk, 1, now)
+        deleted_group.delete()
+        stdout = StringIO()
+        call_command('compact_trending', stdout=stdout)
+        self.assertIn('Удалено записей: 2', stdout.getvalue())
+        self.assertFalse(TrendingScore.objects.filter(kind=POST).exists())
+        self.assertFalse(
+            TrendingScore.objects.filter(
+                kind=TrendingScore.GROUP,
+                object_id=group_pk
+            )
+        )
+
+    def test_deleted_post_leaves_trending(self):
+        post = Post.objects.create(author=self.author, text='Удалю')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        post_pk = post.pk
+        post.delete()
+        self.assertFalse(
+            TrendingScore.objects.filter(kind=POST, object_id=post_pk)
+        )
+
+    def test_moved_post_takes_its_weight_to_new_group(self):
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание'
+        )
+        Comment.objects.create(
+            post=self.hot_post,
+            author=self.reader,
+            text='Комментарий'
+        )
+        weight = self.score(TrendingScore.GROUP, self.group.pk)
+        self.hot_post.group = other_group
+        self.hot_post.save()
+        self.assertFalse(
+            TrendingScore.objects.filter(
+                kind=TrendingScore.GROUP,
+                object_id=self.group.pk
+            )
+        )
+        # Вклад считается от pub_date, а событие записано чуть позже.
+        self.assertAlmostEqual(
+            self.score(TrendingScore.GROUP, other_group.pk),
+            weight,
+            places=4
+        )
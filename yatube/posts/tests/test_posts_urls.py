@@ -48,6 +48,18 @@ class URLTests(TestCase):
         self.assertEqual(response_unexisting.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response_unexisting, 'core/404.html')
 
+    def test_comments_of_missing_post_return_status404(self):
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        self.assertEqual(
+            self.guest_client.get(url).status_code,
+            HTTPStatus.OK
+        )
+        url = reverse('posts:post_comments', args=(self.post.pk + 1,))
+        self.assertEqual(
+            self.guest_client.get(url).status_code,
+            HTTPStatus.NOT_FOUND
+        )
+
     def test_url_uses_correct_template(self):
         for url, template in URLTests.urls_to_templates.items():
             with self.subTest(url=url):
@@ -1,16 +1,20 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.cache import cache
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.test import override_settings
 
+from posts import cache_keys, page_cache
 from posts.models import Group, Post
+from posts.templatetags import post_cards
 
 User = get_user_model()
 
@@ -41,6 +45,10 @@ class ViewsTests(TestCase):
             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
             b'\x0A\x00\x3B'
         )
+        cls.image_name = Post._meta.get_field('image').storage.hashed_name(
+            'posts/small.gif',
+            ContentFile(cls.small_gif)
+        )
         cls.uploaded = SimpleUploadedFile(
             name='small.gif',
             content=cls.small_gif,
@@ -100,7 +108,7 @@ class ViewsTests(TestCase):
                 response = self.authorized_client.get(reversed)
                 self.assertTemplateUsed(response, template)
                 self.assertTrue(
-                    Post.objects.filter(image='posts/small.gif').exists())
+                    Post.objects.filter(image=self.image_name).exists())
 
     def test_about_post_edit_and_create_use_correct_template_authorized(self):
         for url, kwarg in self.templates_and_pages_authorized.items():
@@ -133,6 +141,9 @@ class ViewsTests(TestCase):
     def test_pages_shows_correct_context(self):
         for _, url in self.templates_and_pages_anonymous.items():
             with self.subTest(url=url):
+                # Карточки постов общие для всех лент: без очистки кэша
+                # шаблон карточки на следующих страницах не рендерится.
+                cache.clear()
                 response = self.authorized_client.get(url)
                 self.assertEqual(
                     response.context.get('post').text,
@@ -173,12 +184,110 @@ class ViewsTests(TestCase):
             group=self.group,
         )
         response_first = self.guest_client.get(reverse('posts:index'))
-        content_first = response_first.content
-        cached_post.delete()
+        self.assertEqual(response_first['X-Feed-Cache'], 'miss')
         response_second = self.guest_client.get(reverse('posts:index'))
-        content_second = response_second.content
-        self.assertTrue(content_first == content_second)
-        cache.clear()
+        self.assertEqual(response_second['X-Feed-Cache'], 'hit')
+        self.assertEqual(response_first.content, response_second.content)
+        cached_post.delete()
         response_third = self.guest_client.get(reverse('posts:index'))
-        content_third = response_third.content
-        self.assertFalse(content_first == content_third)
+        self.assertEqual(response_third['X-Feed-Cache'], 'miss')
+        self.assertNotEqual(response_first.content, response_third.content)
+
+    def test_cache_serves_stale_page_while_other_request_renders(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response_first = self.guest_client.get(url)
+        new_post = Post.objects.create(
+            author=self.user,
+            text='Пост во время перерисовки',
+            group=self.group,
+        )
+        scope = page_cache.group_scope(self.group.slug)
+        cache.add(cache_keys.feed_page_lock(scope, url), True)
+        response_stale = self.guest_client.get(url)
+        self.assertEqual(response_stale['X-Feed-Cache'], 'stale')
+        self.assertEqual(response_stale.content, response_first.content)
+        self.assertNotContains(response_stale, new_post.text)
+
+    def test_cache_miss_waits_for_page_rendered_by_lock_holder(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response_first = self.guest_client.get(url)
+        scope = page_cache.group_scope(self.group.slug)
+        key = cache_keys.feed_page(scope, url)
+        entry = cache.get(key)
+        cache.delete(key)
+        cache.add(cache_keys.feed_page_lock(scope, url), True)
+        with mock.patch.object(
+            page_cache.time,
+            'sleep',
+            lambda seconds: cache.set(key, entry)
+        ):
+            response_waited = self.guest_client.get(url)
+        self.assertEqual(response_waited['X-Feed-Cache'], 'hit')
+        self.assertEqual(response_waited.content, response_first.content)
+
+    @override_settings(FEED_CACHE_LOCK_WAIT=0)
+    def test_cache_miss_under_lock_renders_without_storing(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        scope = page_cache.group_scope(self.group.slug)
+        cache.add(cache_keys.feed_page_lock(scope, url), True)
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Feed-Cache'], 'miss')
+        self.assertContains(response, self.one_post.text)
+        self.assertIsNone(cache.get(cache_keys.feed_page(scope, url)))
+
+    def test_cursor_paginator_walks_all_pages(self):
+        for url, kwarg in self.urls_paginator.items():
+            with self.subTest(url=url):
+                response = self.client.get(reverse(url, kwargs=kwarg))
+                first_page = response.context['page_obj']
+                self.assertEqual(len(first_page), FIRST_PAGE_POSTS)
+                self.assertIsNone(first_page.previous_cursor)
+                response = self.client.get(
+                    reverse(url, kwargs=kwarg),
+                    {'cursor': first_page.next_cursor}
+                )
+                second_page = response.context['page_obj']
+                self.assertEqual(len(second_page), SECOND_PAGE_POSTS)
+                self.assertIsNone(second_page.next_cursor)
+                response = self.client.get(
+                    reverse(url, kwargs=kwarg),
+                    {'cursor': second_page.previous_cursor}
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    list(first_page)
+                )
+
+    def test_cursor_paginator_ignores_broken_cursor(self):
+        response = self.client.get(
+            reverse('posts:index'),
+            {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(len(response.context['page_obj']), FIRST_PAGE_POSTS)
+
+    def test_post_card_cache_follows_post_and_author_changes(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        post = Post.objects.get(pk=self.one_post.pk)
+        self.guest_client.get(url)
+        post.text = 'Отредактированный пост'
+        post.save()
+        self.assertContains(self.guest_client.get(url), post.text)
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        self.assertContains(self.guest_client.get(url), 'Новое имя')
+        Post.objects.filter(pk=post.pk).update(text='Изменено в обход save')
+        self.assertNotContains(
+            self.guest_client.get(url),
+            'Изменено в обход save'
+        )
+
+    def test_post_cards_are_loaded_with_one_cache_request(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.guest_client.get(url)
+        with mock.patch.object(
+            post_cards.cache, 'get_many', wraps=post_cards.cache.get_many
+        ) as get_many:
+            response = self.guest_client.get(url)
+        get_many.assert_called_once()
+        self.assertEqual(len(get_many.call_args[0][0]), FIRST_PAGE_POSTS)
+        self.assertTemplateNotUsed(response, 'includes/article.html')
@@ -0,0 +1,109 @@
+"""Ветки комментариев в виде материализованного пути.
+
+Путь комментария — id всех его предков и его собственный, каждый
+дополнен нулями до PATH_STEP знаков. Сортировка по пути даёт обход ветки
+в глубину, поэтому ветку или поддерево читает один запрос по индексу
+(root, path). Ответы глубже MAX_DEPTH становятся ответами на родителя.
+Путь записывает сигнал сохранения, комментариям из bulk_create его
+достраивает команда fill_comment_paths.
+"""
+from collections import defaultdict
+from itertools import islice
+
+from .models import PATH_STEP, Comment
+
+MAX_DEPTH = 5
+REPLIES_PER_THREAD = 10
+
+COMMENT_TABLE = Comment._meta.db_table
+# Первые ответы каждой ветки страницы: ROW_NUMBER по ветке ограничивает
+# выборку прямо в базе, сколько бы ответов ни было в ветках.
+FIRST_REPLIES = (
+    f'{COMMENT_TABLE}.id IN (SELECT id FROM ('
+    f'SELECT id, ROW_NUMBER() OVER (PARTITION BY root_id ORDER BY path) '
+    f'AS position FROM {COMMENT_TABLE} WHERE root_id IN ({{ids}})'
+    f') ranked WHERE position <= %s)'
+)
+
+
+def make_path(comment):
+    prefix = comment.parent.path if comment.parent_id else ''
+    return f'{prefix}{comment.pk:0{PATH_STEP}d}'
+
+
+def reply_parent(parent):
+    """Комментарий, к которому на самом деле прикрепится ответ."""
+    while parent.depth >= MAX_DEPTH:
+        parent = parent.parent
+    return parent
+
+
+def attach_replies(roots, limit=REPLIES_PER_THREAD):
+    """Одним запросом подгружает первые ответы к веткам страницы.
+
+    Каждому началу ветки достаются thread_replies и more_replies —
+    есть ли в ветке ответы сверх показанных.
+    """
+    roots = list(roots)
+    for root in roots:
+        root.thread_replies, root.more_replies = [], False
+    if not roots:
+        return
+    replies = Comment.objects.select_related('author').extra(
+        where=[FIRST_REPLIES.format(ids=', '.join(['%s'] * len(roots)))],
+        params=[*(root.pk for root in roots), limit + 1]
+    ).order_by('path')
+    threads = defaultdict(list)
+    for reply in replies:
+        threads[reply.root_id].append(reply)
+    for root in roots:
+        replies = threads[root.pk]
+        root.thread_replies = replies[:limit]
+        root.more_replies = len(replies) > limit
+
+
+def subtree(comment, after='', limit=REPLIES_PER_THREAD):
+    """Следующие limit ответов поддерева comment после пути after.
+
+    Второе значение — остались ли ответы дальше.
+    """
+    replies = list(Comment.objects.filter(
+        root_id=comment.root_id or comment.pk,
+        path__startswith=comment.path,
+        path__gt=max(after, comment.path)
+    ).select_related('author').order_by('path')[:limit + 1])
+    return replies[:limit], len(replies) > limit
+
+
+def fill_paths(batch_size=1000):
+    """Достраивает путь и начало ветки комментариям без пути.
+
+    Родитель старше ответа, поэтому при обходе по id его путь уже известен.
+    Возвращает число исправленных комментариев.
+    """
+    comments = Comment.objects.filter(path='').order_by('pk').only(
+        'pk',
+        'parent_id'
+    ).iterator(chunk_size=batch_size)
+    parents = {}
+    filled = 0
+    while True:
+        chunk = list(islice(comments, batch_size))
+        if not chunk:
+            return filled
+        missing = {comment.parent_id for comment in chunk} - {None, *parents}
+        parents.update(
+            (pk, (path, root_id or pk))
+            for pk, path, root_id in Comment.objects.filter(
+                pk__in=missing
+            ).values_list('pk', 'path', 'root_id')
+        )
+        for comment in chunk:
+            prefix, comment.root_id = parents.get(
+                comment.parent_id,
+                ('', None)
+            )
+            comment.path = f'{prefix}{comment.pk:0{PATH_STEP}d}'
+            parents[comment.pk] = (comment.path, comment.root_id or comment.pk)
+        Comment.objects.bulk_update(chunk, ['path', 'root'])
+        filled += len(chunk)
@@ -0,0 +1,167 @@
+"""Фоновая нарезка миниатюр для картинок постов.
+
+post_create и post_edit ставят в очередь нарезку всех размеров из
+THUMBNAILS, а шаблоны показывают заглушку, пока миниатюра не готова.
+Очередь — пул процессов (THUMBNAIL_QUEUE='process') или, для тестов и
+разработки, выполнение на месте (THUMBNAIL_QUEUE='inline').
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import page_cache
+from .models import Post
+
+CARD_WIDTHS = (320, 640, 960)
+CARD_ASPECT = 339 / 960
+CARD_SIZES = '(min-width: 992px) 960px, 100vw'
+FORMATS = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+# Производные карточки: каждая ширина в WebP и в JPEG для старых
+# браузеров. Маленькие оригиналы не растягиваются (upscale=False).
+THUMBNAILS = {
+    f'card-{width}-{image_format.lower()}': (
+        f'{width}x{round(width * CARD_ASPECT)}',
+        {'crop': 'center', 'upscale': False, 'format': image_format}
+    )
+    for width in CARD_WIDTHS
+    for image_format in FORMATS
+}
+
+_executor = None
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Вычисляет имя миниатюры, не создавая её.
+
+    Повторяет закрытые методы sorl, поэтому версия sorl закреплена точно,
+    а ReadyThumbnailTest сверяет имена с get_thumbnail.
+    """
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+ready_backend = ReadyThumbnailBackend()
+
+
+def thumbnail_file(image, size):
+    geometry, options = THUMBNAILS[size]
+    return ready_backend.thumbnail_file(image, geometry, **options)
+
+
+def ready_thumbnail(image, size):
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image, size))
+
+
+def card_files(image):
+    return {
+        (image_format, width): thumbnail_file(
+            image,
+            f'card-{width}-{image_format.lower()}'
+        )
+        for image_format in FORMATS
+        for width in CARD_WIDTHS
+    }
+
+
+def collect_sources(files, ready):
+    sources = {}
+    for (image_format, width), thumbnail in files.items():
+        thumbnail = ready.get(thumbnail.key)
+        if thumbnail is None:
+            return None
+        candidates = sources.setdefault(image_format, {})
+        candidates.setdefault(thumbnail.width, thumbnail.url)
+    return {image_format: sorted(candidates.items())
+            for image_format, candidates in sources.items()}
+
+
+class CardSourcesBatch:
+    """Готовые миниатюры страницы, загружаемые при первом обращении.
+
+    Если все карточки страницы взяты из кэша, запроса не будет вовсе.
+    """
+
+    def __init__(self, images):
+        self.files = {image.name: card_files(image) for image in images}
+        self.ready = None
+
+    def sources(self, image):
+        if self.ready is None:
+            self.ready = default.kvstore.get_many(
+                thumbnail
+                for files in self.files.values()
+                for thumbnail in files.values()
+            )
+        return collect_sources(self.files[image.name], self.ready)
+
+
+def prefetch_card_sources(posts):
+    images = [post.image for post in posts if post.image]
+    batch = CardSourcesBatch(images)
+    for image in images:
+        image.card_sources_batch = batch
+
+
+def card_sources(image):
+    """Возвращает srcset по форматам или None, если нарезка не готова."""
+    batch = getattr(image, 'card_sources_batch', None)
+    if batch is not None:
+        return batch.sources(image)
+    files = card_files(image)
+    return collect_sources(files, default.kvstore.get_many(files.values()))
+
+
+def generate_thumbnails(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    for geometry, options in THUMBNAILS.values():
+        get_thumbnail(post.image, geometry, **options)
+    # Новая отметка updated меняет ключ закэшированной карточки поста.
+    Post.objects.filter(pk=post_id).update(updated=timezone.now())
+    page_cache.invalidate_post_feeds(post.group_id)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup
+        )
+    return _executor
+
+
+def enqueue_thumbnails(post):
+    if not post.image:
+        return
+    if settings.THUMBNAIL_QUEUE == 'inline':
+        generate_thumbnails(post.pk)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(generate_thumbnails, post.pk)
+    )
@@ -0,0 +1,169 @@
+"""Материализованная лента подписок (fan-out-on-write).
+
+Новый пост сразу раскладывается в ленты подписчиков автора. Посты
+авторов, у которых подписчиков больше TIMELINE_FANOUT_LIMIT, не
+раскладываются и подмешиваются в ленту при чтении. Записи ленты хранят
+дату поста, и страница — это диапазон индекса (user, -pub_date, -post)
+без соединения с постами и сортировки.
+
+Знаменитость определяется по UserCounters.followers_count. Когда автор
+опускается до лимита, он попадает в очередь TimelineBackfill: его посты
+подмешиваются при чтении, пока rebuild_timelines --pending не разложит
+их в ленты. Если счётчики разошлись с подписками, ленты пересобирает
+команда rebuild_timelines.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import (
+    Follow,
+    Post,
+    TimelineBackfill,
+    TimelineEntry,
+    UserCounters
+)
+from .paginators import TimelinePaginator
+
+
+def is_celebrity(author_id):
+    return UserCounters.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def insert_entries(entries):
+    """Вставляет записи ленты из генератора пачками по TIMELINE_BATCH_SIZE.
+
+    bulk_create сам делает list(objs), поэтому генератор режется здесь.
+    Размер запроса внутри пачки bulk_create подбирает под базу сам.
+    """
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    if is_celebrity(post.author_id):
+        return
+    insert_entries(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True).iterator()
+    )
+
+
+def fill_timeline(user_id, author_id):
+    if is_celebrity(author_id):
+        return
+    post_dates = Post.objects.filter(author_id=author_id).values_list(
+        'pk',
+        'pub_date'
+    )
+    insert_entries(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in post_dates.iterator()
+    )
+
+
+def fan_out_posts(posts):
+    """Раскладывает в ленты посты, созданные в обход сигналов."""
+    author_ids = posts.order_by().values_list('author_id', flat=True)
+    for author_id in author_ids.distinct():
+        if is_celebrity(author_id):
+            continue
+        follower_ids = list(
+            Follow.objects.filter(author_id=author_id)
+            .values_list('user_id', flat=True)
+        )
+        post_dates = posts.filter(author_id=author_id).values_list(
+            'pk',
+            'pub_date'
+        )
+        insert_entries(
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in post_dates.iterator()
+            for user_id in follower_ids
+        )
+
+
+def follower_lost(author_id):
+    """Ставит в очередь раскладку постов автора, переставшего быть
+    знаменитостью.
+
+    Посты, написанные, пока подписчиков было больше лимита, в ленты не
+    попали. До раскладки они подмешиваются при чтении, как у знаменитостей.
+    """
+    if UserCounters.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT
+    ).exists():
+        TimelineBackfill.objects.bulk_create(
+            [TimelineBackfill(author_id=author_id)],
+            ignore_conflicts=True
+        )
+
+
+def backfill_pending():
+    """Раскладывает посты авторов из очереди, возвращает их число."""
+    author_ids = list(
+        TimelineBackfill.objects.values_list('author_id', flat=True)
+    )
+    for author_id in author_ids:
+        with transaction.atomic():
+            TimelineBackfill.objects.filter(author_id=author_id).delete()
+            fan_out_posts(Post.objects.filter(author_id=author_id))
+    return len(author_ids)
+
+
+def clear_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def celebrity_ids(user):
+    """Авторы пользователя, чьи посты подмешиваются при чтении."""
+    return Follow.objects.filter(user=user).filter(
+        Q(author__counters__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+        | Q(author_id__in=TimelineBackfill.objects.values('author_id'))
+    ).values_list('author_id', flat=True)
+
+
+def follow_feed(user):
+    celebrities = list(celebrity_ids(user))
+    if not celebrities:
+        return Post.objects.for_feed().filter(timeline_entries__user=user)
+    return Post.objects.for_feed().filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=celebrities)
+    )
+
+
+def follow_page(user, cursor, per_page):
+    """Страница ленты подписок по курсору.
+
+    Строки страницы — один диапазон индекса TimelineEntry (и диапазон
+    постов знаменитостей), посты страницы читаются потом одним запросом.
+    """
+    celebrities = list(celebrity_ids(user))
+    page = TimelinePaginator(
+        TimelineEntry.objects.filter(user=user),
+        per_page,
+        Post.objects.filter(author_id__in=celebrities) if celebrities else None
+    ).get_page(cursor)
+    posts = Post.objects.for_feed().in_bulk(
+        [post_id for _, post_id in page]
+    ) if page.object_list else {}
+    page.object_list = [
+        posts[post_id] for _, post_id in page if post_id in posts
+    ]
+    return page
@@ -0,0 +1,151 @@
+"""Популярное: посты, группы и авторы по затухающему весу событий.
+
+Событие с весом w в момент t к моменту now весит w·e^(-(now - t)/τ), где
+τ = TRENDING_HALF_LIFE / ln 2. У всех записей общий множитель e^(-now/τ),
+поэтому в TrendingScore.score хранится ln Σ w·e^((t - EPOCH)/τ): порядок
+по нему совпадает с порядком по весу в любой момент, и старые записи не
+надо пересчитывать. Новое событие прибавляется одним UPDATE через
+logaddexp, индекс (kind, -score) держит записи отсортированными, а топ —
+это начало индекса. Запись поста удаляется вместе с постом, при переносе
+поста в другую группу его вклад переходит к новой группе. Команда
+compact_trending удаляет остывшие записи и записи удалённых объектов.
+"""
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .models import Group, Post, TrendingScore, User
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+POST_WEIGHT = 1
+COMMENT_WEIGHT = 2
+FOLLOW_WEIGHT = 1
+WIDGET_SIZE = 5
+MODELS = {
+    TrendingScore.POST: Post,
+    TrendingScore.GROUP: Group,
+    TrendingScore.AUTHOR: User,
+}
+
+
+def log_weight(weight, moment):
+    decay_time = settings.TRENDING_HALF_LIFE / math.log(2)
+    return math.log(weight) + (moment - EPOCH).total_seconds() / decay_time
+
+
+def logaddexp(a, b):
+    return max(a, b) + math.log1p(math.exp(-abs(a - b)))
+
+
+def record(kind, object_id, weight, moment=None):
+    """Прибавляет событие к весу объекта."""
+    add(kind, object_id, log_weight(weight, moment or timezone.now()))
+
+
+def add(kind, object_id, score):
+    """Прибавляет к весу объекта вес в шкале score."""
+    if object_id is None:
+        return
+    added = Value(score)
+    # ln(e^a + e^b) = max(a, b) + ln(1 + e^-|a - b|) не переполняется.
+    updated = TrendingScore.objects.filter(
+        kind=kind,
+        object_id=object_id
+    ).update(score=Greatest(F('score'), added) + Ln(
+        Value(1.0) + Exp(-Abs(F('score') - added)),
+        output_field=FloatField()
+    ))
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            TrendingScore.objects.create(
+                kind=kind,
+                object_id=object_id,
+                score=score
+            )
+    except IntegrityError:
+        # Запись успел создать параллельный запрос.
+        add(kind, object_id, score)
+
+
+def subtract(kind, object_id, score, now=None):
+    """Вычитает из веса объекта вес в шкале score.
+
+    ln(e^a - e^b) = a + ln(1 - e^(b - a)). Если остаток легче
+    TRENDING_MIN_WEIGHT, запись удаляется, как при compact.
+    """
+    if object_id is None:
+        return
+    threshold = log_weight(settings.TRENDING_MIN_WEIGHT, now or timezone.now())
+    with transaction.atomic():
+        record = ranked(kind).select_for_update().filter(
+            object_id=object_id
+        ).first()
+        if record is None:
+            return
+        remaining = -math.inf
+        if record.score > score:
+            remaining = record.score + math.log1p(
+                -math.exp(score - record.score)
+            )
+        if remaining < threshold:
+            record.delete()
+            return
+        record.score = remaining
+        record.save(update_fields=['score'])
+
+
+def move_post(post, previous_group_id):
+    """Переносит вклад поста в вес группы на его новую группу.
+
+    Вклад — событие создания поста и его комментарии. Комментарии,
+    написанные, пока пост был без группы, тоже переносятся: старой
+    группе они не засчитывались, поэтому её вес может уйти в ноль.
+    """
+    contribution = log_weight(POST_WEIGHT, post.pub_date)
+    post_score = ranked(TrendingScore.POST).filter(
+        object_id=post.pk
+    ).values_list('score', flat=True).first()
+    if post_score is not None:
+        contribution = logaddexp(contribution, post_score)
+    subtract(TrendingScore.GROUP, previous_group_id, contribution)
+    add(TrendingScore.GROUP, post.group_id, contribution)
+
+
+def forget(kind, object_id):
+    ranked(kind).filter(object_id=object_id).delete()
+
+
+def ranked(kind):
+    return TrendingScore.objects.filter(kind=kind)
+
+
+def top(kind, limit=WIDGET_SIZE):
+    """Самые популярные группы или авторы в порядке веса."""
+    ids = list(
+        ranked(kind).order_by('-score').values_list('object_id', flat=True)
+        [:limit]
+    )
+    objects = MODELS[kind].objects.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def compact(now=None):
+    """Удаляет остывшие записи и записи удалённых объектов."""
+    threshold = log_weight(
+        settings.TRENDING_MIN_WEIGHT,
+        now or timezone.now()
+    )
+    deleted, _ = TrendingScore.objects.filter(score__lt=threshold).delete()
+    for kind, model in MODELS.items():
+        orphans, _ = ranked(kind).exclude(
+            object_id__in=model.objects.values('pk')
+        ).delete()
+        deleted += orphans
+    return deleted
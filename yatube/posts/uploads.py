@@ -0,0 +1,86 @@
+"""Нормализация картинок при загрузке.
+
+Оригинал читается из временного файла загрузки, поворачивается по EXIF,
+уменьшается до IMAGE_MAX_SIDE и перекодируется в JPEG (или в WebP, если
+у картинки есть прозрачность). Метаданные при этом не сохраняются.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image, ImageOps
+
+INVALID_IMAGE = 'Не удалось прочитать картинку.'
+FORMATS = {
+    'JPEG': ('.jpg', 'image/jpeg'),
+    'WEBP': ('.webp', 'image/webp'),
+}
+
+
+def has_alpha(image):
+    if image.mode == 'P':
+        return 'transparency' in image.info
+    if image.mode not in ('RGBA', 'LA'):
+        return False
+    return image.getchannel('A').getextrema()[0] < 255
+
+
+def open_image(upload):
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='file_too_large',
+            params={'limit': settings.IMAGE_MAX_UPLOAD_SIZE // 2 ** 20}
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        image = None
+    except (OSError, SyntaxError):
+        raise ValidationError(INVALID_IMAGE, code='invalid_image')
+    else:
+        # Open читает только заголовок: размер проверяется до декодирования.
+        width, height = image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            image = None
+    if image is None:
+        raise ValidationError(
+            'Слишком большое разрешение картинки.',
+            code='too_many_pixels'
+        )
+    return image
+
+
+def normalize_image(upload):
+    image = open_image(upload)
+    max_side = settings.IMAGE_MAX_SIDE
+    output = BytesIO()
+    try:
+        # Для JPEG декодер сразу уменьшает картинку в 2-8 раз, не раскладывая
+        # в памяти оригинал целиком.
+        scale = min(1, max_side / max(image.size))
+        image.draft('RGB', tuple(round(side * scale) for side in image.size))
+        image = ImageOps.exif_transpose(image)
+        image_format = 'WEBP' if has_alpha(image) else 'JPEG'
+        image = image.convert('RGBA' if image_format == 'WEBP' else 'RGB')
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        image.save(
+            output,
+            image_format,
+            quality=settings.IMAGE_QUALITY,
+            optimize=True,
+            progressive=True
+        )
+    except (OSError, SyntaxError):
+        # Open читает только заголовок, битые данные видны при декодировании.
+        raise ValidationError(INVALID_IMAGE, code='invalid_image')
+    size = output.tell()
+    output.seek(0)
+    extension, content_type = FORMATS[image_format]
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    return InMemoryUploadedFile(
+        output, 'image', name, content_type, size, None
+    )
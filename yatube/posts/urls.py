@@ -11,12 +11,42 @@ urlpatterns = [
     path('posts/<int:post_id>', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/replies/',
+        views.comment_replies,
+        name='comment_replies'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'
     ),
+    path('search/', views.search, name='search'),
+    path(
+        'export/<str:table>/',
+        views.export_own_data,
+        name='export_own_data'
+    ),
+    path('trending/', views.trending_index, name='trending_index'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/many/', views.follow_many, name='follow_many'),
+    path(
+        'profile/<str:username>/followers/',
+        views.follow_list,
+        {'direction': 'followers'},
+        name='followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.follow_list,
+        {'direction': 'following'},
+        name='following'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,20 +1,37 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_POST
 
+from core.routers import replica_reads
+
+from . import export, follows, suggestions, threads, trending
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, TrendingScore, User
+from .page_cache import INDEX_SCOPE, feed_cache, group_scope
+from .paginators import (
+    CommentPaginator,
+    FollowPaginator,
+    SearchPaginator,
+    TrendingPaginator,
+    paginate
+)
+from .search import search_posts
+from .thumbnails import enqueue_thumbnails, prefetch_card_sources
+from .timeline import follow_feed, follow_page
 
 NUMBER_OF_POSTS = 10
+COMMENTS_PER_PAGE = 20
+PEOPLE_PER_PAGE = 50
+OWN_DATA = ('posts', 'comments')
 
 
-@cache_page(20)
+@replica_reads
+@feed_cache(lambda: INDEX_SCOPE)
 def index(request):
-    post_list = Post.objects.select_related('group').all()
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = paginate(request, post_list, NUMBER_OF_POSTS)
+    prefetch_card_sources(page_obj)
     context = {
         'page_obj': page_obj,
         'index': True
@@ -22,12 +39,13 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
+@feed_cache(group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    group_posts = group.posts.all()
-    paginator = Paginator(group_posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group_posts = group.posts.for_feed()
+    page_obj = paginate(request, group_posts, NUMBER_OF_POSTS)
+    prefetch_card_sources(page_obj)
     content = {
         'page_obj': page_obj,
         'group': group,
@@ -35,16 +53,20 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', content)
 
 
+@replica_reads
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    user_posts = author.posts.all()
-    paginator = Paginator(user_posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    user_posts = author.posts.for_feed()
+    page_obj = paginate(request, user_posts, NUMBER_OF_POSTS)
+    prefetch_card_sources(page_obj)
     context = {
         'page_obj': page_obj,
         'author': author,
-        'not_show_button': True
+        'not_show_button': True,
+        'suggestions': suggestions.for_user(request.user)
     }
     if request.user.is_anonymous or request.user == author:
         return render(request, 'posts/profile.html', context)
@@ -57,18 +79,94 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@replica_reads
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = Comment.objects.filter(post__id=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__counters'),
+        id=post_id
+    )
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
-        'comments': comments,
-        'form': form
+        'comments': comment_page(request, post_id),
+        'form': form,
+        'reply_to': request.GET.get('reply_to', '')
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_page(request, post_id):
+    """Страница начал веток с первыми ответами каждой."""
+    comments = Comment.objects.filter(
+        post_id=post_id,
+        parent=None
+    ).select_related('author')
+    page = CommentPaginator(comments, COMMENTS_PER_PAGE).get_page(
+        request.GET.get('cursor')
+    )
+    threads.attach_replies(page)
+    return page
+
+
+def comment_json(comment):
+    return {
+        'id': comment.pk,
+        'parent': comment.parent_id,
+        'depth': comment.depth,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat()
+    }
+
+
+@replica_reads
+def post_comments(request, post_id):
+    """Следующие страницы комментариев: HTML-фрагмент или JSON."""
+    comments = comment_page(request, post_id)
+    # Непустая страница сама доказывает, что пост существует.
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    **comment_json(comment),
+                    'replies': list(map(comment_json, comment.thread_replies)),
+                    'more_replies': comment.more_replies
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor
+        })
+    context = {
+        'post_id': post_id,
+        'comments': comments
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@replica_reads
+def comment_replies(request, post_id, comment_id):
+    """Продолжение ветки или поддерева после пути ?after=."""
+    comment = get_object_or_404(Comment, pk=comment_id, post_id=post_id)
+    replies, more_replies = threads.subtree(
+        comment,
+        request.GET.get('after', '')
+    )
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'replies': list(map(comment_json, replies)),
+            'more_replies': more_replies
+        })
+    context = {
+        'post_id': post_id,
+        'thread': comment,
+        'replies': replies,
+        'more_replies': more_replies
+    }
+    return render(request, 'posts/includes/replies.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None, )
@@ -76,6 +174,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        enqueue_thumbnails(post)
         return redirect('posts:profile', username=post.author.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -93,6 +192,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         post.save()
+        if 'image' in form.changed_data:
+            enqueue_thumbnails(post)
         return redirect('posts:post_detail', post_id=post_id)
     return render(
         request,
@@ -109,43 +210,146 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        parent_id = request.POST.get('parent', '')
+        if parent_id.isdigit():
+            comment.parent = post.comments.filter(pk=parent_id).first()
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
+def search(request):
+    query = request.GET.get('q', '').strip()
+    found_posts = search_posts(Post.objects.for_feed(), query)
+    page_obj = SearchPaginator(found_posts, NUMBER_OF_POSTS).get_page(
+        request.GET.get('cursor')
+    )
+    prefetch_card_sources(page_obj)
+    context = {
+        'page_obj': page_obj,
+        'search_query': query
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
-def follow_index(request):
-    following_authors = Follow.objects.filter(user=request.user).values_list(
-        'author_id',
-        flat=True
+def export_own_data(request, table):
+    if table not in OWN_DATA:
+        raise Http404
+    _, fields = export.TABLES[table]
+    queryset = getattr(request.user, table).all()
+    if request.GET.get('format') == 'csv':
+        extension = 'csv'
+        response = StreamingHttpResponse(
+            export.stream(queryset, fields, 'csv'),
+            content_type=export.CONTENT_TYPES['csv']
+        )
+    else:
+        extension = 'json'
+        response = StreamingHttpResponse(
+            export.stream_json(queryset, fields),
+            content_type='application/json'
+        )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{request.user.username}-{table}.{extension}"'
+    )
+    return response
+
+
+@replica_reads
+def trending_index(request):
+    page_obj = TrendingPaginator(
+        trending.ranked(TrendingScore.POST),
+        NUMBER_OF_POSTS
+    ).get_page(request.GET.get('cursor'))
+    posts = Post.objects.for_feed().in_bulk(
+        [score.object_id for score in page_obj]
     )
-    following_posts = Post.objects.filter(author_id__in=following_authors)
-    paginator = Paginator(following_posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj.object_list = [
+        posts[score.object_id] for score in page_obj
+        if score.object_id in posts
+    ]
+    prefetch_card_sources(page_obj)
+    context = {
+        'page_obj': page_obj,
+        'trending': True,
+        'trending_groups': trending.top(TrendingScore.GROUP),
+        'trending_authors': trending.top(TrendingScore.AUTHOR)
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@login_required
+@replica_reads
+def follow_index(request):
+    if request.GET.get('page') is not None:
+        page_obj = paginate(
+            request,
+            follow_feed(request.user),
+            NUMBER_OF_POSTS
+        )
+    else:
+        page_obj = follow_page(
+            request.user,
+            request.GET.get('cursor'),
+            NUMBER_OF_POSTS
+        )
+    prefetch_card_sources(page_obj)
     context = {
         'page_obj': page_obj,
         'title': 'Ваши подписки',
         'following': True,
-        'follow': True
+        'follow': True,
+        'suggestions': suggestions.for_user(request.user)
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    follower = request.user
     author = get_object_or_404(User, username=username)
-    if (Follow.objects.filter(user=follower, author=author).exists()
-            or follower == author):
-        return render(request, 'posts/index.html')
-    Follow.objects.create(user=follower, author=author)
-    return render(request, 'posts/follow.html')
+    follows.follow(request.user, author)
+    return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    follower = request.user
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=follower, author=author).delete()
-    return render(request, 'posts/follow.html')
+    follows.unfollow(request.user, author)
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+@require_POST
+def follow_many(request):
+    usernames = request.POST.getlist('username')[:follows.BULK_LIMIT]
+    follows.follow_many(
+        request.user,
+        User.objects.filter(username__in=usernames).values_list(
+            'pk',
+            flat=True
+        )
+    )
+    return redirect('posts:follow_index')
+
+
+@replica_reads
+def follow_list(request, username, direction):
+    """Подписчики автора или его подписки, постранично по курсору."""
+    author = get_object_or_404(User, username=username)
+    if direction == 'followers':
+        people = author.following.select_related('user')
+        person, title = 'user', f'Подписчики {username}'
+    else:
+        people = author.follower.select_related('author')
+        person, title = 'author', f'Подписки {username}'
+    page_obj = FollowPaginator(people, PEOPLE_PER_PAGE).get_page(
+        request.GET.get('cursor')
+    )
+    context = {
+        'page_obj': page_obj,
+        'people': [getattr(follow, person) for follow in page_obj],
+        'author': author,
+        'title': title
+    }
+    return render(request, 'posts/follow_list.html', context)
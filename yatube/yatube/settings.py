@@ -55,6 +55,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PinPrimaryAfterWriteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -87,12 +88,50 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# DB_ENGINE=postgresql включает PostgreSQL с постоянными соединениями,
+# DB_REPLICA_HOSTS — список реплик через запятую для чтения лент.
+# По умолчанию используется SQLite в режиме WAL (SQLITE_WAL=0 отключает).
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+SQLITE_WAL = os.getenv('SQLITE_WAL', '1') == '1'
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('DB_USER', 'yatube'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv(
+                'DB_NAME',
+                os.path.join(BASE_DIR, 'db.sqlite3')
+            ),
+        }
     }
-}
+
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_COOKIE = 'pin_primary'
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -140,11 +179,64 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Общий для всех воркеров кэш включается переменной CACHE_LOCATION,
+# например "10.0.0.5:11211,10.0.0.6:11211". Клиент pylibmc держит
+# постоянные соединения на поток и отдаёт get_many одним запросом.
+# Бэкенд можно заменить через CACHE_BACKEND (например, на клиент Redis).
+# Без CACHE_LOCATION используется локальный LocMemCache.
+CACHE_LOCATION = os.getenv('CACHE_LOCATION')
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'KEY_PREFIX': 'yatube',
+        'VERSION': int(os.getenv('CACHE_VERSION', 1)),
     }
 }
+PYLIBMC_BACKEND = 'django.core.cache.backends.memcached.PyLibMCCache'
+if CACHE_LOCATION:
+    CACHES['default'].update({
+        'BACKEND': os.getenv('CACHE_BACKEND', PYLIBMC_BACKEND),
+        'LOCATION': CACHE_LOCATION.split(','),
+    })
+    # Эти OPTIONS понимает только pylibmc, другим клиентам они не нужны.
+    if CACHES['default']['BACKEND'] == PYLIBMC_BACKEND:
+        CACHES['default']['OPTIONS'] = {
+            'binary': True,
+            'behaviors': {'tcp_nodelay': True, 'ketama': True},
+        }
+THUMBNAIL_QUEUE = os.getenv('THUMBNAIL_QUEUE', 'process')
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
+SEARCH_MAX_TERMS = 10
+# inline — индекс обновляется при сохранении поста, background — изменения
+# копятся в журнале и их переносит команда search_indexer
+SEARCH_INDEXER = os.getenv('SEARCH_INDEXER', 'inline')
+SEARCH_INDEX_BATCH_SIZE = 500
+
+# Ограничения и перекодирование загружаемых картинок
+IMAGE_MAX_UPLOAD_SIZE = int(os.getenv('IMAGE_MAX_UPLOAD_SIZE', 10 * 2 ** 20))
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 50_000_000))
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', 1920))
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', 85))
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60
+FEED_CACHE_TIMEOUT = 60
+FEED_CACHE_STALE_TIMEOUT = 600
+FEED_CACHE_LOCK_TIMEOUT = 10
+FEED_CACHE_LOCK_WAIT = 1
+
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BATCH_SIZE = 1000
+
+# Сколько рекомендаций «кого почитать» хранится на пользователя
+SUGGESTIONS_PER_USER = 20
+
+# Популярное: за сколько секунд вес события падает вдвое и с какого веса
+# запись удаляет compact_trending
+TRENDING_HALF_LIFE = 24 * 60 * 60
+TRENDING_MIN_WEIGHT = 0.05
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 INTERNAL_IPS = [